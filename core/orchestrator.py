@@ -3,17 +3,62 @@ Enhanced Main Agent with better prompt understanding and query optimization.
 """
 
 import os
-import json
 import re
-import time
+import sys
+from functools import cached_property
+from utils import json_utils
 from utils.gemini_client import get_gemini_model
-from pipelines.foundry_pipeline import FoundryPipeline, FoundryBYODPipeline
+from utils.llm_cache import cached_llm
 from utils.logger import setup_logging, get_logger
 from utils.pipeline_features import get_pipeline_features
 
+try:
+    import ijson
+except ImportError:  # optional; COCO summaries then parse the whole file
+    ijson = None
+
 setup_logging()
 logger = get_logger("main_agent")
 
+# "get 10 images of dogs" style requests: a count and a single bare noun, which
+# is both the search query and the object to annotate. Anything richer
+# ("red cars", "people walking", several objects, folders) goes to the model,
+# which separates the object to box from its modifiers.
+_SIMPLE_REQUEST = re.compile(
+    r'(?i)(?:please\s+)?(?:create|get|find|mine|need|collect)\s+([1-9]\d*)\s+'
+    r'(?:images?|photos?|pictures?)\s+of\s+([a-z]+)\s*$'
+)
+
+# Top-level COCO arrays that are only counted, not kept, when streaming
+_COCO_COUNTED = {"images.item": "images", "annotations.item": "annotations"}
+
+# Shown once by run_interactive_mode before the prompt
+_BANNER = "\n".join([
+    "",
+    "=" * 70,
+    "🤖 Foundry: AI-Powered Dataset Creation System",
+    "   Using: Enhanced Prompt Understanding 🚀",
+    "=" * 70,
+    "\n📚 What I Can Do:\n",
+    "┌─ MODE 1: CREATE NEW DATASET ─────────────────────────────┐",
+    "│ Describe what you want - I'll understand the context!   │",
+    "└──────────────────────────────────────────────────────────┘",
+    "\n💡 Examples:",
+    "   • 'create 5 images of man holding guitar, annotate man and guitar'",
+    "   • 'get 10 images of red sports cars on highway'",
+    "   • 'I need 15 images of people walking dogs in parks'",
+    "",
+    "┌─ MODE 2: ANNOTATE YOUR OWN IMAGES (BYOD) ───────────────┐",
+    "│ Already have images? I'll detect objects for you.       │",
+    "└──────────────────────────────────────────────────────────┘",
+    "\n💡 Examples:",
+    "   • 'annotate dogs in C:\\\\my_photos'",
+    "   • 'I have images at /home/pics, detect cats and dogs'",
+    "",
+    "🎯 What would you like to do?\n",
+    "",
+])
+
 
 class MainAgent:
     """
@@ -26,22 +71,43 @@ class MainAgent:
     - Provides detailed progress feedback
     """
     
+    INSTRUCTIONS = (
+        "You are the Main Orchestrator Agent for Foundry dataset creation. "
+        "You excel at understanding user requests and extracting: "
+        "1. Scene description (for searching images) "
+        "2. Objects to annotate (for detection) "
+        "3. Number of images needed "
+        "You provide clear, structured responses."
+    )
+    
     def __init__(self):
-        instructions = (
-            "You are the Main Orchestrator Agent for Foundry dataset creation. "
-            "You excel at understanding user requests and extracting: "
-            "1. Scene description (for searching images) "
-            "2. Objects to annotate (for detection) "
-            "3. Number of images needed "
-            "You provide clear, structured responses."
-        )
-        self.model = get_gemini_model(system_instruction=instructions)
+        self.features = get_pipeline_features()
         logger.info("🚀 MainAgent initialized with enhanced prompt understanding")
     
-    def _run_model(self, prompt: str) -> str:
-        """Helper to run the model and get text response."""
+    @cached_property
+    def model(self):
+        """Request-parsing model, created on the first uncached parse."""
+        return get_gemini_model(system_instruction=self.INSTRUCTIONS)
+    
+    # Structured-output schema for parse_request (JSON mode)
+    PARSE_SCHEMA = {
+        "type": "OBJECT",
+        "properties": {
+            "mode": {"type": "STRING", "enum": ["standard", "byod"]},
+            "search_query": {"type": "STRING", "nullable": True},
+            "annotation_objects": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "count": {"type": "INTEGER", "nullable": True},
+            "image_dir": {"type": "STRING", "nullable": True},
+            "reasoning": {"type": "STRING"}
+        },
+        "required": ["mode", "search_query", "annotation_objects", "count", "image_dir"]
+    }
+    
+    @cached_llm(namespace="main_parse")
+    def _run_model(self, prompt: str, generation_config: dict = None) -> str:
+        """Helper to run the model and get text response (cached per prompt)."""
         try:
-            response = self.model.generate_content(prompt)
+            response = self.model.generate_content(prompt, generation_config=generation_config)
             if response and response.text:
                 return response.text
             return ""
@@ -64,9 +130,26 @@ class MainAgent:
         """
         logger.info(f"Parsing request: '{user_request}'")
         
+        # Plain "get N images of <thing>" needs no model round-trip
+        match = _SIMPLE_REQUEST.match(user_request.strip())
+        if match:
+            count, subject = int(match.group(1)), match.group(2)
+            logger.info(f"✅ Parsed without model: {count} x '{subject}'")
+            return {
+                "mode": "standard",
+                "search_query": subject,
+                "annotation_objects": [subject],
+                "count": count,
+                "image_dir": None,
+                "reasoning": "Simple request, parsed directly"
+            }
+        
+        # Collapse whitespace so retyped requests hit the same cached response
+        # (case is kept: BYOD requests carry file paths)
+        normalized_request = " ".join(user_request.split())
         parse_prompt = f"""Analyze this dataset creation request and extract information:
 
-"{user_request}"
+"{normalized_request}"
 
 Return ONLY a JSON object with this EXACT structure:
 {{
@@ -96,17 +179,25 @@ Input: "I have images in /path/folder, detect dogs and cats"
 Output: {{"mode": "byod", "search_query": null, "annotation_objects": ["dog", "cat"], "count": null, "image_dir": "/path/folder", "reasoning": "BYOD mode - annotating existing images"}}
 """
         
-        response = self._run_model(parse_prompt)
+        # JSON mode: the model is constrained to emit exactly this object
+        response = self._run_model(parse_prompt, generation_config={
+            "response_mime_type": "application/json",
+            "response_schema": self.PARSE_SCHEMA
+        })
         
         try:
-            # Extract JSON
-            match = re.search(r'\{.*\}', response, re.DOTALL)
-            if match:
-                parsed = json.loads(match.group(0))
-                logger.info(f"✅ Parsed: {parsed.get('reasoning', '')}")
-                return parsed
-            else:
-                raise ValueError("No JSON found in response")
+            try:
+                parsed = json_utils.loads(response)
+            except json_utils.JSONDecodeError:
+                # Free-form reply (e.g. cached from before JSON mode); extract the object
+                json_text = json_utils.extract_json_object(response)
+                if not json_text:
+                    raise ValueError("No JSON found in response")
+                parsed = json_utils.loads(json_text)
+            if not isinstance(parsed, dict):
+                raise ValueError("Response is not a JSON object")
+            logger.info(f"✅ Parsed: {parsed.get('reasoning', '')}")
+            return parsed
         except Exception as e:
             logger.error(f"Failed to parse: {e}")
             # Fallback to simple parsing
@@ -183,6 +274,9 @@ Output: {{"mode": "byod", "search_query": null, "annotation_objects": ["dog", "c
         # Join annotation objects for annotation query
         annotation_query = ",".join(annotation_objects)
         
+        # Imported on use: the pipelines pull in numpy/PIL and every service,
+        # which parsing and the interactive prompt never need
+        from pipelines.foundry_pipeline import FoundryPipeline
         pipeline = FoundryPipeline(
             query=search_query,  # For mining
             target_count=count,
@@ -198,11 +292,10 @@ Output: {{"mode": "byod", "search_query": null, "annotation_objects": ["dog", "c
             self._display_coco_info(result.get("output_path"))
         
         # Show metrics
-        features = get_pipeline_features()
-        if features.enable_metrics:
-            features.print_metrics_summary()
+        if self.features.enable_metrics:
+            self.features.print_metrics_summary()
     
-    def _execute_byod(self, parsed: dict):
+    def _execute_byod(self, parsed: dict, image_paths: list = None):
         """Execute BYOD mode."""
         image_dir = parsed["image_dir"]
         annotation_objects = parsed["annotation_objects"]
@@ -210,18 +303,25 @@ Output: {{"mode": "byod", "search_query": null, "annotation_objects": ["dog", "c
         # Join objects for query string
         query = ",".join(annotation_objects)
         
-        pipeline = FoundryBYODPipeline(image_dir=image_dir, query=query)
+        from pipelines.foundry_pipeline import FoundryBYODPipeline
+        pipeline = FoundryBYODPipeline(image_dir=image_dir, query=query, image_paths=image_paths)
         result = pipeline.run()
         
         if result["status"] == "success":
             self._display_coco_info(result.get("output_path"))
         
-        features = get_pipeline_features()
-        if features.enable_metrics:
-            features.print_metrics_summary()
+        if self.features.enable_metrics:
+            self.features.print_metrics_summary()
     
-    def run_byod_mode(self, image_dir: str, query: str):
-        """BYOD mode entry point."""
+    def run_byod_mode(self, image_dir: str, query: str, image_paths: list = None):
+        """
+        BYOD mode entry point.
+        
+        Args:
+            image_dir: Directory containing the images
+            query: Comma-separated objects to annotate
+            image_paths: Optional pre-built list of images; skips listing image_dir
+        """
         parsed = {
             "mode": "byod",
             "search_query": None,
@@ -230,34 +330,14 @@ Output: {{"mode": "byod", "search_query": null, "annotation_objects": ["dog", "c
             "image_dir": image_dir
         }
         self.confirm_plan(parsed)
-        self._execute_byod(parsed)
+        self._execute_byod(parsed, image_paths)
     
     def run_interactive_mode(self):
         """Interactive mode with enhanced understanding."""
-        print("\n" + "="*70)
-        print("🤖 Foundry: AI-Powered Dataset Creation System")
-        print("   Using: Enhanced Prompt Understanding 🚀")
-        print("="*70)
-        print("\n📚 What I Can Do:\n")
-        
-        print("┌─ MODE 1: CREATE NEW DATASET ─────────────────────────────┐")
-        print("│ Describe what you want - I'll understand the context!   │")
-        print("└──────────────────────────────────────────────────────────┘")
-        print("\n💡 Examples:")
-        print("   • 'create 5 images of man holding guitar, annotate man and guitar'")
-        print("   • 'get 10 images of red sports cars on highway'")
-        print("   • 'I need 15 images of people walking dogs in parks'")
-        print()
-        
-        print("┌─ MODE 2: ANNOTATE YOUR OWN IMAGES (BYOD) ───────────────┐")
-        print("│ Already have images? I'll detect objects for you.       │")
-        print("└──────────────────────────────────────────────────────────┘")
-        print("\n💡 Examples:")
-        print("   • 'annotate dogs in C:\\\\my_photos'")
-        print("   • 'I have images at /home/pics, detect cats and dogs'")
-        print()
-        
-        print("🎯 What would you like to do?\n")
+        # Banner is for people at a terminal; piped/CI runs skip it
+        if sys.stdout.isatty():
+            sys.stdout.write(_BANNER)
+            sys.stdout.flush()
         
         user_input = input("Your request: ").strip()
         
@@ -276,83 +356,80 @@ Output: {{"mode": "byod", "search_query": null, "annotation_objects": ["dog", "c
             return
         
         try:
-            with open(output_path, 'r') as f:
-                coco = json.load(f)
+            num_images, num_annotations, categories, sample = _coco_summary(output_path)
             
-            print("\n" + "="*70)
-            print("📊 COCO Format Verification")
-            print("="*70)
-            print(f"✅ Format: Valid COCO JSON")
-            print(f"📁 Images: {len(coco.get('images', []))}")
-            print(f"🏷️  Annotations: {len(coco.get('annotations', []))}")
-            print(f"📦 Categories: {len(coco.get('categories', []))}")
+            lines = [
+                "",
+                "=" * 70,
+                "📊 COCO Format Verification",
+                "=" * 70,
+                "✅ Format: Valid COCO JSON",
+                f"📁 Images: {num_images}",
+                f"🏷️  Annotations: {num_annotations}",
+                f"📦 Categories: {len(categories)}",
+            ]
             
-            if coco.get('categories'):
-                print("\n📋 Categories:")
-                for cat in coco['categories']:
-                    print(f"   - ID {cat['id']}: {cat['name']}")
+            if categories:
+                lines.append("\n📋 Categories:")
+                lines.extend(f"   - ID {cat['id']}: {cat['name']}" for cat in categories)
             
-            if coco.get('annotations'):
-                sample = coco['annotations'][0]
-                print("\n📐 Sample Annotation:")
-                print(f"   - Bounding Box: {sample['bbox']} [x, y, width, height]")
-                print(f"   - Category ID: {sample['category_id']}")
-                print(f"   - Area: {sample['area']}")
+            if sample:
+                lines += [
+                    "\n📐 Sample Annotation:",
+                    f"   - Bounding Box: {sample['bbox']} [x, y, width, height]",
+                    f"   - Category ID: {sample['category_id']}",
+                    f"   - Area: {sample['area']}",
+                ]
             
-            print("\n✅ Ready for training with PyTorch/TensorFlow!")
-            print("="*70 + "\n")
+            lines += ["\n✅ Ready for training with PyTorch/TensorFlow!", "=" * 70 + "\n"]
+            # One write instead of a print per line
+            print("\n".join(lines))
             
         except Exception as e:
             logger.error(f"Error reading COCO file: {e}")
 
 
-# Enhanced Pipeline that handles separate search and annotation
-class EnhancedFoundryPipeline(FoundryPipeline):
-    """
-    Enhanced pipeline with separate search query and annotation objects.
+def _coco_summary(path: str):
     """
+    Count a COCO file's images and annotations and pick out what is displayed.
     
-    def __init__(self, search_query: str, annotation_objects: list, target_count: int):
-        """
-        Initialize enhanced pipeline.
-        
-        Args:
-            search_query: Query for finding images (e.g., "person playing guitar")
-            annotation_objects: Objects to detect (e.g., ["person", "guitar"])
-            target_count: Number of images to collect
-        """
-        # Join annotation objects for internal query format
-        query = ",".join(annotation_objects)
-        
-        # Store both
-        self.search_query = search_query
-        self.annotation_objects = annotation_objects
-        
-        # Initialize parent with annotation query
-        super().__init__(query=query, target_count=target_count)
-        
-        logger.info(f"Enhanced Pipeline: search='{search_query}', annotate={annotation_objects}")
+    With ijson installed the file is streamed: images and annotations are
+    counted from parser events and only the categories and the first
+    annotation are built as objects, so large datasets are never fully
+    loaded. Otherwise the whole file is parsed.
     
-    def _execute_mining(self, needed: int) -> dict:
-        """Execute mining with optimized search query."""
-        request_count = min(needed, 5)
-        logger.info(f"🔍 Mining: Searching for '{self.search_query}' ({request_count} images)")
-        
-        start_time = time.time()
+    Args:
+        path: Path to the COCO JSON file
         
-        # Use search_query instead of self.query for better results
-        mine_result = self._miner.mine(self.search_query, max_images=request_count)
-        elapsed = time.time() - start_time
-        
-        if mine_result["status"] == "error" or not mine_result.get("data"):
-            logger.warning(f"Mining failed: {mine_result.get('error_message', 'Unknown')}")
-            if self.metrics:
-                self.metrics.record_mining(attempted=request_count, successful=0, time_taken=elapsed)
-            return {"images": []}
-        
-        images = mine_result["data"]
-        if self.metrics:
-            self.metrics.record_mining(attempted=request_count, successful=len(images), time_taken=elapsed)
-        
-        logger.info(f"✅ Mining: Retrieved {len(images)} images")
-        return {"images": images}
+    Returns:
+        (num_images, num_annotations, categories, first annotation or None)
+    """
+    with open(path, 'rb') as f:
+        if ijson is None:
+            # Raw bytes straight into the parser (orjson when installed)
+            coco = json_utils.loads(f.read())
+            annotations = coco.get('annotations', [])
+            return (len(coco.get('images', [])), len(annotations), coco.get('categories', []),
+                    annotations[0] if annotations else None)
+        
+        counts = {"images": 0, "annotations": 0}
+        categories, sample = [], None
+        builder = building = None
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == building and event == 'end_map':
+                    if building == "categories.item":
+                        categories.append(builder.value)
+                    else:
+                        sample = builder.value
+                    builder = building = None
+                continue
+            if event != 'start_map':
+                continue
+            if prefix in _COCO_COUNTED:
+                counts[_COCO_COUNTED[prefix]] += 1
+            if prefix == "categories.item" or (prefix == "annotations.item" and sample is None):
+                builder, building = ijson.ObjectBuilder(), prefix
+                builder.event(event, value)
+        return counts["images"], counts["annotations"], categories, sample
@@ -141,8 +141,9 @@ Examples:
     parser.add_argument(
         "--validation-method",
         type=str,
-        choices=["coordinate", "visual", "hybrid"],
-        help="Quality validation method: coordinate (fast), visual (accurate), hybrid (best)"
+        choices=["coordinate", "visual", "hybrid", "hybrid_fast"],
+        help="Quality validation method: coordinate (fast), visual (accurate), hybrid (best), "
+             "hybrid_fast (hybrid, skipping the visual check when coordinates already fail)"
     )
     
     parser.add_argument(
@@ -151,6 +152,12 @@ Examples:
         help="Show detailed metrics summary"
     )
     
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the on-disk cache of curation/annotation results"
+    )
+    
     args = parser.parse_args()
     
     # Initialize config
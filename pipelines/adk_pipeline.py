@@ -4,43 +4,76 @@ ADK-based pipeline implementation with real agent integration.
 This module wraps the existing Foundry agents (Miner, Curator, Annotator)
 as function tools for ADK's LlmAgent, then orchestrates them using:
 - `SequentialAgent` for Miner → Curator → Annotator flow
+- `ParallelAgent` to run several of those sequences at once (optional)
 - `LoopAgent` to repeat until target count is reached
 """
 
+import math
+import asyncio
+import functools
+import threading
+from contextlib import nullcontext
 from typing import Dict, List
-from google.adk.agents import LlmAgent, SequentialAgent, LoopAgent
+from google.adk.agents import LlmAgent, SequentialAgent, ParallelAgent, LoopAgent
 from pipelines.adk_state import PipelineState
 from services.miner import MinerService
 from services.curator import CuratorService
 from services.annotator import AnnotatorService
+from utils.config_loader import get_config
 from utils.logger import get_logger
 
 logger = get_logger("adk_pipeline")
 
-def create_adk_pipeline(state: PipelineState):
+def _run_in_thread(tool, state: PipelineState, lock: threading.Lock = None):
     """
-    Create ADK pipeline with state-aware tools.
+    Wrap a blocking tool as a coroutine that runs on a worker thread.
+    
+    ADK calls plain-function tools directly on its event loop, which would
+    make the branches of a ParallelAgent take turns. Once the target count
+    is reached, calls return an empty result without doing any work.
     
     Args:
-        state: Pipeline state to pass to tools
+        tool: Tool function from a service's as_adk_tool
+        state: Pipeline state (checked for the stop condition)
+        lock: Optional lock held for the whole call
         
     Returns:
-        Configured LoopAgent
+        Async tool with the same name, docstring and signature
     """
+    def call(**kwargs):
+        with lock or nullcontext():
+            if state.should_stop():
+                return {"status": "success", "images": [], "annotations": {}, "count": 0, "stop": True}
+            return tool(**kwargs)
     
-    # Create tools with state bound
-    miner_tool = MinerService().as_adk_tool(state)
-    curator_tool = CuratorService().as_adk_tool(state)
-    annotator_tool = AnnotatorService().as_adk_tool(state)
+    @functools.wraps(tool)
+    async def run(**kwargs):
+        return await asyncio.to_thread(call, **kwargs)
+    
+    return run
+
+def _create_sequence(state: PipelineState, miner_tool, curator_tool, annotator_tool,
+                     request_count: int, suffix: str = ""):
+    """
+    Build one Miner → Curator → Annotator sequence.
     
+    Args:
+        state: Pipeline state
+        miner_tool, curator_tool, annotator_tool: Tools for the three agents
+        request_count: Images the miner is asked for
+        suffix: Appended to agent names (ADK requires them to be unique)
+        
+    Returns:
+        Configured SequentialAgent
+    """
     # MinerAgent with real search capability
     miner_agent = LlmAgent(
-        name="MinerAgent",
+        name=f"MinerAgent{suffix}",
         model="gemini-2.5-flash",
         instruction=(
             "You are a Mining Agent responsible for finding images. "
             f"Use the mine_tool to search for images matching '{state.query}'. "
-            f"Request {state.get_needed_count()} images. "
+            f"Request {request_count} images. "
             "The tool will return a list of image URLs that have been downloaded and deduplicated."
         ),
         tools=[miner_tool]
@@ -48,12 +81,13 @@ def create_adk_pipeline(state: PipelineState):
     
     # CuratorAgent with real validation
     curator_agent = LlmAgent(
-        name="CuratorAgent",
+        name=f"CuratorAgent{suffix}",
         model="gemini-2.5-flash",
         instruction=(
             "You are a Curator Agent. Your goal is to filter images to ensure they match the user's query. "
             f"Use the curate_tool to validate images for '{state.query}'. "
-            "Pass the mined images to the tool. "
+            "Pass the entire list of mined images to the tool in one invocation; "
+            "it checks several images per model request, so do not call it once per image. "
             "The tool will analyze each image and determine if it strictly contains the ACTUAL OBJECT visually present in the image. "
             "CRITICAL RULES: "
             "- The object must be VISUALLY PRESENT and clearly visible in the image. "
@@ -68,12 +102,13 @@ def create_adk_pipeline(state: PipelineState):
     
     # AnnotatorAgent with real bounding box generation
     annotator_agent = LlmAgent(
-        name="AnnotatorAgent",
+        name=f"AnnotatorAgent{suffix}",
         model="gemini-2.5-flash",
         instruction=(
             "You are an Annotation Agent. Your goal is to detect objects in images and provide bounding boxes. "
             f"Use the annotate_tool to generate bounding boxes for '{state.query}'. "
-            "Pass the curated images to the tool. "
+            "Pass the entire list of curated images to the tool in one invocation; "
+            "it annotates several images per model request, so do not call it once per image. "
             "The tool can detect single or multiple object types in an image. "
             "It returns bounding boxes in [ymin, xmin, ymax, xmax] format normalized to 0-1000. "
             "Output will be valid JSON - a list of objects with double quotes: [{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}, ...]. "
@@ -83,18 +118,62 @@ def create_adk_pipeline(state: PipelineState):
         tools=[annotator_tool]
     )
     
+    return SequentialAgent(
+        name=f"FoundrySequentialPipeline{suffix}",
+        sub_agents=[miner_agent, curator_agent, annotator_agent]
+    )
+
+def create_adk_pipeline(state: PipelineState, branches: int = None):
+    """
+    Create ADK pipeline with state-aware tools.
+    
+    With more than one branch, each loop iteration runs that many
+    sequences concurrently, each mining an equal share of the images still
+    needed. Mining calls take turns, since the branches share the miner's
+    search position and duplicate index; curation and annotation overlap.
+    
+    Args:
+        state: Pipeline state to pass to tools
+        branches: Sequences run per iteration (default: adk.parallel_branches config)
+        
+    Returns:
+        Configured LoopAgent
+    """
+    config = get_config()
+    if branches is None:
+        branches = config.get('adk.parallel_branches', 1)
+    branches = max(1, branches)
+    
+    # Create tools with state bound
+    miner_tool = MinerService().as_adk_tool(state)
+    curator_tool = CuratorService().as_adk_tool(state)
+    annotator_tool = AnnotatorService().as_adk_tool(state)
+    
     # ---------------------------------------------------------------------------
     # ADK Pipeline Definition
     # ---------------------------------------------------------------------------
-    sequential_pipeline = SequentialAgent(
-        name="FoundrySequentialPipeline",
-        sub_agents=[miner_agent, curator_agent, annotator_agent]
-    )
+    if branches == 1:
+        pipeline = _create_sequence(state, miner_tool, curator_tool, annotator_tool,
+                                    request_count=state.get_needed_count())
+    else:
+        mine_lock = threading.Lock()
+        miner_tool = _run_in_thread(miner_tool, state, lock=mine_lock)
+        curator_tool = _run_in_thread(curator_tool, state)
+        annotator_tool = _run_in_thread(annotator_tool, state)
+        request_count = math.ceil(state.get_needed_count() / branches)
+        pipeline = ParallelAgent(
+            name="FoundryParallelPipeline",
+            sub_agents=[
+                _create_sequence(state, miner_tool, curator_tool, annotator_tool,
+                                 request_count=request_count, suffix=f"_{i + 1}")
+                for i in range(branches)
+            ]
+        )
     
     loop_pipeline = LoopAgent(
         name="FoundryTargetLoop",
-        sub_agents=[sequential_pipeline],
-        max_iterations=20  # Safety limit to prevent infinite loops
+        sub_agents=[pipeline],
+        max_iterations=config.get('adk.max_loop_iterations', 20)  # Safety limit to prevent infinite loops
     )
     
     return loop_pipeline
@@ -7,6 +7,8 @@ Manages shared state across ADK workflow agents, including:
 - Termination conditions
 """
 
+import threading
+from itertools import islice
 from typing import Dict, List
 from utils.logger import get_logger
 
@@ -18,6 +20,8 @@ class PipelineState:
     Shared state for ADK pipeline execution.
     
     Tracks dataset progress and determines when to stop the loop.
+    Updates are locked, so tools running on several threads (parallel
+    ADK branches) can share one state.
     """
     
     def __init__(self, target_count: int, query: str):
@@ -36,6 +40,7 @@ class PipelineState:
         self.total_mined = 0
         self.total_curated = 0
         self.total_annotated = 0
+        self._lock = threading.Lock()
         
         logger.info(f"Pipeline state initialized: target={target_count}, query='{query}'")
     
@@ -49,14 +54,11 @@ class PipelineState:
         Returns:
             True if target count reached, False otherwise
         """
-        added = 0
-        for filename, data in annotations.items():
-            if self.current_count < self.target_count:
-                self.dataset[filename] = data
-                self.current_count += 1
-                added += 1
-            else:
-                break
+        with self._lock:
+            remaining = self.get_needed_count()
+            self.dataset.update(islice(annotations.items(), remaining))
+            added = min(len(annotations), remaining)
+            self.current_count += added
         
         logger.info(f"Added {added} annotations. Progress: {self.current_count}/{self.target_count}")
         return self.should_stop()
@@ -77,17 +79,20 @@ class PipelineState:
     
     def record_mining(self, count: int):
         """Record mining results."""
-        self.total_mined += count
+        with self._lock:
+            self.total_mined += count
         logger.debug(f"Mining: +{count} images (total: {self.total_mined})")
     
     def record_curation(self, count: int):
         """Record curation results."""
-        self.total_curated += count
+        with self._lock:
+            self.total_curated += count
         logger.debug(f"Curation: +{count} images (total: {self.total_curated})")
     
     def record_annotation(self, count: int):
         """Record annotation results."""
-        self.total_annotated += count
+        with self._lock:
+            self.total_annotated += count
         logger.debug(f"Annotation: +{count} images (total: {self.total_annotated})")
     
     def get_summary(self) -> Dict:
@@ -5,19 +5,40 @@ This module defines the high-level pipeline orchestration using Google ADK.
 It integrates the Miner, Curator, and Annotator agents into a cohesive workflow.
 """
 
+import math
 import os
-import time
+import asyncio
+import threading
+from functools import cached_property
+from itertools import islice
 from typing import Dict, List
 from services.miner import MinerService
 from services.curator import CuratorService
 from services.annotator import AnnotatorService
 from services.parallel_annotator import ParallelAnnotatorAgent
 from services.engineer import EngineerService
+from pipelines.adk_state import PipelineState
+from utils.async_utils import run_sync
+from utils.file_manager import list_images
 from utils.logger import get_logger
+from utils.metrics import Stopwatch
 from utils.pipeline_features import get_pipeline_features
 
 logger = get_logger("adk_pipeline")
 
+# Upper bound on miner top-up rounds per run
+MAX_MINING_ROUNDS = 20
+
+# Capacity of the queues between stages (applies backpressure upstream)
+STAGE_QUEUE_SIZE = 8
+
+# Share of mined images assumed to reach the dataset until enough have been
+# seen to measure it (i.e. mine 2x the remaining need)
+DEFAULT_YIELD = 0.5
+MIN_YIELD_SAMPLES = 8
+# Floor on the measured yield; caps over-fetching at 10x the remaining need
+MIN_YIELD = 0.1
+
 
 class FoundryPipeline:
     """
@@ -41,11 +62,12 @@ class FoundryPipeline:
         self.annotation_query = annotation_query or query  # For annotation
         self.target_count = target_count
         self.dataset = {}
+        # Mined paths already sent to curation; filenames are content hashes,
+        # so a re-surfaced search result maps to the same path
+        self._processed_paths = set()
         
-        # Initialize agents (needed for tools)
-        self._miner = MinerService()
-        self._curator = CuratorService()
-        self._annotator = AnnotatorService()
+        # Time spent converting annotations to COCO during the run
+        self._engineer_time = 0.0
         
         # Get features
         self.features = get_pipeline_features()
@@ -53,21 +75,37 @@ class FoundryPipeline:
         
         logger.info(f"Foundry Pipeline initialized: query='{query}', target={target_count}")
     
+    # Services are created on first use, so constructing a pipeline stays cheap
+    @cached_property
+    def _miner(self) -> MinerService:
+        return MinerService()
+    
+    @cached_property
+    def _curator(self) -> CuratorService:
+        return CuratorService()
+    
+    @cached_property
+    def _annotator(self) -> AnnotatorService:
+        return AnnotatorService()
+    
+    @cached_property
+    def _engineer(self) -> EngineerService:
+        # COCO output, filled in as annotations arrive
+        return EngineerService(query=self.annotation_query)  # Use annotation query for categories
+    
     def run(self) -> Dict:
         """
-        Execute the pipeline using ADK workflow agents.
+        Execute the pipeline.
         
         Returns:
             Dictionary with results and statistics
         """
-        from pipelines.adk_state import PipelineState
-        
         logger.info("="*70)
         logger.info("🚀 STARTING FOUNDRY PIPELINE (Fallback Mode)")
         logger.info("="*70)
         logger.info(f"Query: '{self.query}'")
         logger.info(f"Target: {self.target_count} images")
-        logger.info(f"Architecture: Direct Sequential [Mine → Curate → Annotate]")
+        logger.info(f"Architecture: Overlapping stages [Mine → Curate → Annotate]")
         logger.info("="*70)
         
         if self.metrics:
@@ -78,90 +116,8 @@ class FoundryPipeline:
         
         try:
             logger.info("Running pipeline with direct tool calls...")
-            
-            # Import tools
-            from services.miner import MinerService
-            from services.curator import CuratorService
-            from services.annotator import AnnotatorService
-            
-            miner = MinerService()
-            curator = CuratorService()
-            annotator = AnnotatorService()
-            
-            max_iterations = 20
-            iteration = 0
-            
-            while not state.should_stop() and iteration < max_iterations:
-                iteration += 1
-                state.increment_iteration()
-                
-                logger.info(f"\n{'='*70}")
-                logger.info(f"Iteration {iteration} - Need {state.get_needed_count()} more images")
-                logger.info(f"{'='*70}")
-                
-                # Mine
-                logger.info("1️⃣  Mining images...")
-                needed = state.get_needed_count() * 2  # Request 2x to account for filtering
-                
-                # Track mining time
-                mine_start = time.time()
-                mine_result = miner.mine(self.query, needed)
-                mine_time = time.time() - mine_start
-                
-                # Extract paths from result dictionary
-                if mine_result["status"] == "success":
-                    mined_paths = mine_result["data"]
-                else:
-                    mined_paths = []
-                
-                state.record_mining(len(mined_paths))
-                if self.metrics:
-                    self.metrics.record_mining(attempted=needed, successful=len(mined_paths), time_taken=mine_time)
-                logger.info(f"   ✓ Mined {len(mined_paths)} images")
-                
-                if not mined_paths:
-                    logger.warning("   ⚠ No images mined, stopping")
-                    break
-                
-                # Curate
-                logger.info("2️⃣  Curating images...")
-                curate_start = time.time()
-                curated_paths = curator.curate(self.query, mined_paths)
-                curate_time = time.time() - curate_start
-                
-                state.record_curation(len(curated_paths))
-                if self.metrics:
-                    self.metrics.record_curation(total=len(mined_paths), kept=len(curated_paths), time_taken=curate_time)
-                logger.info(f"   ✓ Curated {len(curated_paths)} images")
-                
-                if not curated_paths:
-                    logger.warning("   ⚠ No images passed curation, stopping")
-                    break
-                
-                # Annotate
-                logger.info("3️⃣  Annotating images...")
-                annotate_start = time.time()
-                annotations = annotator.annotate(self.annotation_query, curated_paths)
-                annotate_time = time.time() - annotate_start
-                
-                state.record_annotation(len(annotations))
-                if self.metrics:
-                    self.metrics.record_annotation(total=len(curated_paths), successful=len(annotations), time_taken=annotate_time)
-                logger.info(f"   ✓ Annotated {len(annotations)} images")
-                
-                if not annotations:
-                    logger.warning("   ⚠ No annotations generated, stopping")
-                    break
-                
-                # Add to dataset
-                should_stop = state.add_annotations(annotations)
-                logger.info(f"   📊 Progress: {state.current_count}/{state.target_count}")
-                
-                if should_stop:
-                    logger.info(f"   ✅ Target reached!")
-                    break
-            
-            logger.info(f"\nPipeline completed in {iteration} iterations")
+            run_sync(self._run_stages(state))
+            logger.info(f"\nPipeline completed in {state.iteration} iterations")
             
         except Exception as e:
             logger.error(f"Pipeline failed: {e}", exc_info=True)
@@ -204,18 +160,242 @@ class FoundryPipeline:
             "adk_mode": True
         }
     
+    async def _run_stages(self, state: PipelineState):
+        """
+        Run mining, curation and annotation as overlapping stages.
+        
+        Each stage is a pool of asyncio tasks connected by bounded queues, so
+        the curator verifies images while the miner is still fetching and the
+        annotator labels keepers while curation continues. Curator workers
+        take up to one curator batch of queued images at a time; everything
+        else moves downstream per image. The consumer adds finished
+        annotations to the state and cancels upstream work once the target
+        is reached.
+        
+        The miner tops the pipeline up in rounds, sized by the share of
+        mined images that has made it into the dataset so far (2x the need
+        until that is known). A new round starts as soon as the images still
+        in flight are not expected to cover the remaining need, so the next
+        downloads run while the current ones are still being curated and
+        annotated, and it requests enough to cover the need again.
+        
+        Args:
+            state: Pipeline state to accumulate results into
+        """
+        num_curators = self._curator.max_concurrency
+        num_annotators = self._annotator.max_workers
+        
+        # Bounded so a fast miner cannot pile up decoded images ahead of the model
+        mined_q: asyncio.Queue = asyncio.Queue(maxsize=STAGE_QUEUE_SIZE)
+        curated_q: asyncio.Queue = asyncio.Queue(maxsize=STAGE_QUEUE_SIZE)
+        annotated_q: asyncio.Queue = asyncio.Queue()
+        
+        # Images mined but not yet rejected, failed or added to the dataset
+        in_flight = 0
+        # Images mined and added to the dataset this run (for the yield estimate)
+        mined_total = accepted_total = 0
+        progress = asyncio.Condition()
+        
+        # Set once the run is over; tells the miner's download thread and
+        # annotator workers (mid-retry included) to stop without more requests
+        run_over = threading.Event()
+        
+        # Busy time per stage, recorded to metrics once the run ends
+        totals = {"curated_in": 0, "curated_out": 0, "curate_time": 0.0,
+                  "annotated_in": 0, "annotated_out": 0, "annotate_time": 0.0,
+                  "engineer_time": 0.0}
+        
+        async def resolve(count: int = 1):
+            """Mark in-flight images as finished and wake the miner."""
+            nonlocal in_flight
+            async with progress:
+                in_flight -= count
+                progress.notify_all()
+        
+        def expected_yield() -> float:
+            """Share of finished images that were added to the dataset."""
+            finished = mined_total - in_flight
+            if finished < MIN_YIELD_SAMPLES:
+                return DEFAULT_YIELD
+            return max(accepted_total / finished, MIN_YIELD)
+        
+        def miner_should_refill() -> bool:
+            return state.should_stop() or in_flight * expected_yield() < state.get_needed_count()
+        
+        async def mine_stage():
+            nonlocal in_flight, mined_total
+            try:
+                for _ in range(MAX_MINING_ROUNDS):
+                    async with progress:
+                        await progress.wait_for(miner_should_refill)
+                    if state.should_stop():
+                        break
+                    
+                    state.increment_iteration()
+                    # Over-fetch to account for filtering
+                    needed = math.ceil(state.get_needed_count() / expected_yield()) - in_flight
+                    
+                    logger.info(f"\n{'='*70}")
+                    logger.info(f"Iteration {state.iteration} - Need {state.get_needed_count()} more images")
+                    logger.info(f"{'='*70}")
+                    logger.info("1️⃣  Mining images...")
+                    
+                    # Pull one download at a time so curation starts on the first
+                    # image; a full queue pauses the miner between downloads
+                    stream = self._miner.mine_stream(self.query, needed, stop_event=run_over)
+                    mined = skipped = 0
+                    mine_time = 0.0
+                    try:
+                        while True:
+                            with Stopwatch() as sw:
+                                path = await asyncio.to_thread(next, stream, None)
+                            mine_time += sw.elapsed
+                            if path is None:
+                                break
+                            mined += 1
+                            
+                            # Skip images already sent to curation earlier in this run
+                            if path in self._processed_paths:
+                                skipped += 1
+                                continue
+                            self._processed_paths.add(path)
+                            in_flight += 1
+                            mined_total += 1
+                            await mined_q.put(path)
+                    finally:
+                        try:
+                            stream.close()
+                        except ValueError:
+                            # Cancelled mid-download: the stream is still running in its
+                            # thread and ends itself once it sees run_over
+                            pass
+                    
+                    state.record_mining(mined)
+                    if self.metrics:
+                        self.metrics.record_mining(attempted=needed, successful=mined, time_taken=mine_time)
+                    logger.info(f"   ✓ Mined {mined} images")
+                    if skipped:
+                        logger.info(f"   ↺ Skipped {skipped} already-processed images")
+                    
+                    if not mined:
+                        logger.warning("   ⚠ No images mined, stopping")
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"   ✗ Mining failed: {e}")
+            
+            for _ in range(num_curators):
+                await mined_q.put(None)
+        
+        async def curate_worker():
+            done = False
+            while not done:
+                path = await mined_q.get()
+                if path is None:
+                    break
+                
+                # Take whatever else is already queued, up to one curator batch
+                batch = [path]
+                while len(batch) < self._curator.batch_size and not mined_q.empty():
+                    path = mined_q.get_nowait()
+                    if path is None:
+                        done = True
+                        break
+                    batch.append(path)
+                
+                with Stopwatch() as sw:
+                    try:
+                        # Decode once; kept records carry the image on to the annotator
+                        records = await self._curator.load_records(batch)
+                        kept = await self._curator.curate_records_async(self.query, records)
+                    except Exception as e:
+                        logger.error(f"   ✗ Curation failed for {len(batch)} images: {e}")
+                        kept = []
+                totals["curate_time"] += sw.elapsed
+                totals["curated_in"] += len(batch)
+                totals["curated_out"] += len(kept)
+                
+                state.record_curation(len(kept))
+                for record in kept:
+                    await curated_q.put(record)
+                if len(kept) < len(batch):
+                    await resolve(len(batch) - len(kept))
+        
+        async def curate_stage():
+            await asyncio.gather(*(curate_worker() for _ in range(num_curators)))
+            for _ in range(num_annotators):
+                await curated_q.put(None)
+        
+        async def annotate_worker():
+            while (record := await curated_q.get()) is not None:
+                with Stopwatch() as sw:
+                    try:
+                        annotations = await asyncio.to_thread(self._annotator.annotate, self.annotation_query,
+                                                                [record], run_over)
+                    except Exception as e:
+                        logger.error(f"   ✗ Annotation failed for {record.path}: {e}")
+                        annotations = {}
+                totals["annotate_time"] += sw.elapsed
+                totals["annotated_in"] += 1
+                totals["annotated_out"] += len(annotations)
+                
+                state.record_annotation(len(annotations))
+                if annotations:
+                    annotated_q.put_nowait(annotations)
+                else:
+                    await resolve()
+        
+        async def annotate_stage():
+            await asyncio.gather(*(annotate_worker() for _ in range(num_annotators)))
+            annotated_q.put_nowait(None)
+        
+        stages = [
+            asyncio.create_task(mine_stage()),
+            asyncio.create_task(curate_stage()),
+            asyncio.create_task(annotate_stage()),
+        ]
+        
+        try:
+            while (annotations := await annotated_q.get()) is not None:
+                # Convert accepted images to COCO as they arrive, not after the run
+                fresh = ((filename, data) for filename, data in annotations.items()
+                         if filename not in state.dataset)
+                accepted = dict(islice(fresh, state.get_needed_count()))
+                with Stopwatch() as sw:
+                    for filename, data in accepted.items():
+                        self._engineer.process_item(filename, data)
+                totals["engineer_time"] += sw.elapsed
+                
+                should_stop = state.add_annotations(accepted)
+                accepted_total += len(accepted)
+                logger.info(f"   📊 Progress: {state.current_count}/{state.target_count}")
+                await resolve()
+                
+                if should_stop:
+                    logger.info(f"   ✅ Target reached!")
+                    break
+        finally:
+            run_over.set()
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            
+            if self.metrics:
+                self.metrics.record_curation(total=totals["curated_in"], kept=totals["curated_out"],
+                                             time_taken=totals["curate_time"])
+                self.metrics.record_annotation(total=totals["annotated_in"], successful=totals["annotated_out"],
+                                               time_taken=totals["annotate_time"])
+            self._engineer_time = totals["engineer_time"]
+    
     def _save_dataset(self) -> str:
         """Save dataset to COCO format."""
         logger.info(f"💾 Saving dataset with {len(self.dataset)} images...")
         
-        start_time = time.time()
-        engineer = EngineerService(query=self.annotation_query)  # Use annotation query for categories
-        
-        for filename, data in self.dataset.items():
-            engineer.process_item(filename, data)
-        
-        output_path = engineer.save()
-        elapsed = time.time() - start_time
+        # Items were already converted as they were collected
+        with Stopwatch() as sw:
+            output_path = self._engineer.save()
+        elapsed = self._engineer_time + sw.elapsed
         
         if self.metrics:
             self.metrics.record_engineering(count=len(self.dataset), time_taken=elapsed)
@@ -227,27 +407,41 @@ class FoundryPipeline:
 class FoundryBYODPipeline:
     """BYOD mode: Annotate existing images."""
     
-    def __init__(self, image_dir: str, query: str):
+    def __init__(self, image_dir: str, query: str, image_paths: List[str] = None):
+        """
+        Args:
+            image_dir: Directory containing the images
+            query: Comma-separated objects to annotate
+            image_paths: Optional pre-built list of images; skips listing image_dir
+        """
         self.image_dir = image_dir
         self.query = query
-        self._annotator = AnnotatorService()
+        self.image_paths = image_paths
         
         self.features = get_pipeline_features()
         self.metrics = self.features.get_metrics() if self.features.enable_metrics else None
-        
-        self.quality_loop = None
+    
+    @cached_property
+    def _annotator(self) -> AnnotatorService:
+        return AnnotatorService()
+    
+    @cached_property
+    def quality_loop(self):
         if self.features.enable_quality_loop:
-            self.quality_loop = self.features.create_quality_loop(self._annotator)
-        
-        self.parallel_annotator = ParallelAnnotatorAgent(
+            return self.features.create_quality_loop(self._annotator)
+        return None
+    
+    @cached_property
+    def parallel_annotator(self) -> ParallelAnnotatorAgent:
+        # Used for multi-image directories and whenever the quality loop is on
+        return ParallelAnnotatorAgent(
             num_workers=3,
-            quality_loop=self.quality_loop
+            quality_loop=self.quality_loop,
+            service=self._annotator
         )
     
     def run(self) -> Dict:
         """Execute BYOD pipeline."""
-        from utils.file_manager import list_images
-        
         logger.info("="*70)
         logger.info("📁 BYOD MODE - Annotating Your Images")
         logger.info("="*70)
@@ -259,7 +453,7 @@ class FoundryBYODPipeline:
             self.metrics.start_pipeline()
         
         # Get images
-        image_paths = list_images(self.image_dir)
+        image_paths = self.image_paths if self.image_paths is not None else list_images(self.image_dir)
         if not image_paths:
             logger.error(f"No images found in {self.image_dir}")
             return {"status": "error", "message": "No images found"}
@@ -267,30 +461,29 @@ class FoundryBYODPipeline:
         logger.info(f"Found {len(image_paths)} images")
         
         # Annotate
-        start_time = time.time()
-        if len(image_paths) > 1:
-            annotations = self.parallel_annotator.annotate_parallel(self.query, image_paths)
-        else:
-            annotations = self._annotator.annotate(self.query, image_paths)
-        elapsed = time.time() - start_time
+        with Stopwatch() as sw:
+            if len(image_paths) > 1 or self.quality_loop is not None:
+                # With the quality loop, images are refined while the next ones
+                # decode on the loop's prefetch pool
+                annotations = self.parallel_annotator.annotate_parallel(self.query, image_paths)
+            else:
+                annotations = self._annotator.annotate(self.query, image_paths)
         
         if self.metrics:
-            self.metrics.record_annotation(total=len(image_paths), successful=len(annotations), time_taken=elapsed)
+            self.metrics.record_annotation(total=len(image_paths), successful=len(annotations), time_taken=sw.elapsed)
         
         if not annotations:
             logger.error("No annotations generated")
             return {"status": "error", "message": "Annotation failed"}
         
         # Save
-        start_time = time.time()
-        engineer = EngineerService(query=self.query)
-        for filename, data in annotations.items():
-            engineer.process_item(filename, data)
-        output_path = engineer.save()
-        elapsed = time.time() - start_time
+        with Stopwatch() as sw:
+            engineer = EngineerService(query=self.query)
+            engineer.process_items(annotations.items())
+            output_path = engineer.save()
         
         if self.metrics:
-            self.metrics.record_engineering(count=len(annotations), time_taken=elapsed)
+            self.metrics.record_engineering(count=len(annotations), time_taken=sw.elapsed)
             self.metrics.end_pipeline()
         
         logger.info("="*70)
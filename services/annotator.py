@@ -1,14 +1,95 @@
 import os
-import json
 import re
 import time
-from typing import Dict, List, Any, Optional
-from PIL import Image
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Tuple, Union
 from utils.logger import get_logger
 from utils.gemini_client import get_gemini_model
+from utils.disk_cache import get_cache, DEFAULT_TTL
+from utils.image_prep import ImageRecord
+from utils.json_utils import loads, JSONDecodeError, decode_boxes, extract_code_block, normalize_quotes, remove_trailing_commas
+from utils.pipeline_features import get_pipeline_features
 
 logger = get_logger("annotator")
 
+# JSON mode for annotation: a list of {"label", "bbox"} objects. Greedy
+# decoding with an output cap; the cap also covers thinking tokens on 2.5
+# models, so it leaves headroom above the box list itself.
+ANNOTATION_CONFIG = {
+    "temperature": 0.0,
+    "max_output_tokens": 4096,
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {
+                "label": {"type": "STRING"},
+                "bbox": {"type": "ARRAY", "items": {"type": "NUMBER"}}
+            },
+            "required": ["label", "bbox"]
+        }
+    }
+}
+
+# JSON mode for multi-image requests: one box list per image, in order
+BATCH_ANNOTATION_CONFIG = {
+    "temperature": 0.0,
+    "max_output_tokens": 8192,
+    "response_mime_type": "application/json",
+    "response_schema": {"type": "ARRAY", "items": ANNOTATION_CONFIG["response_schema"]}
+}
+
+# Annotation prompts, filled in with str.format per request
+_SINGLE_PROMPT = (
+    "Return bounding boxes for ALL instances of {obj} in this image. "
+    "Output ONLY valid JSON with double quotes: [{{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}}]. "
+    "Use normalized coordinates (0-1000 range). No explanations, just JSON."
+)
+_SINGLE_RETRY_PROMPT = (
+    "Find ALL instances of {obj} in this image. "
+    "Return ONLY a JSON array of objects. Each object must have 'label' and 'bbox' keys. "
+    "Format: [{{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}}]. "
+    "Use normalized coordinates (0-1000). Example: [{{\"label\": \"dog\", \"bbox\": [100, 200, 300, 400]}}]. "
+    "Return ONLY the JSON array, no other text."
+)
+_MULTI_PROMPT = (
+    "Return bounding boxes for ALL instances of these objects in this image: {objects_list}. "
+    "Detect and label each object separately. "
+    "Output ONLY valid JSON with double quotes: [{{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}}]. "
+    "Use normalized coordinates (0-1000 range). No explanations, just JSON."
+)
+_MULTI_RETRY_PROMPT = (
+    "Find ALL instances of these objects: {objects_list}. "
+    "Return ONLY a JSON array. Each object must have 'label' and 'bbox' keys. "
+    "Format: [{{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}}]. "
+    "Use normalized coordinates (0-1000). Return ONLY the JSON array."
+)
+_BATCH_PROMPT = (
+    "For each of the {count} images below (in order), return bounding boxes for ALL instances of {objects_text}. "
+    "Output ONLY valid JSON with double quotes: an array with one entry per image, where each entry is a list "
+    "[{{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}}]. "
+    "Use normalized coordinates (0-1000 range). No explanations, just JSON."
+)
+
+# Patterns for repairing output that still arrives malformed
+_JSON_START = re.compile(r'[\[{]')
+_JSON_ARRAY = re.compile(r'\[\s*{[\s\S]*}\s*]')
+_BBOX = re.compile(r'\[\s*\d+(?:\.\d+)?\s*,\s*\d+(?:\.\d+)?\s*,\s*\d+(?:\.\d+)?\s*,\s*\d+(?:\.\d+)?\s*]')
+_LABEL = re.compile(r'["\']?label["\']?\s*:\s*["\']([^"\'\']+)["\']', re.IGNORECASE)
+
+# services.parallel_annotator imports this module, so it is resolved on first use
+_ParallelAnnotatorAgent = None
+
+def _parallel_annotator_cls():
+    """Return ParallelAnnotatorAgent, importing it once."""
+    global _ParallelAnnotatorAgent
+    if _ParallelAnnotatorAgent is None:
+        from services.parallel_annotator import ParallelAnnotatorAgent
+        _ParallelAnnotatorAgent = ParallelAnnotatorAgent
+    return _ParallelAnnotatorAgent
+
 class AnnotatorService:
     """
     Service responsible for detecting objects and generating bounding boxes.
@@ -17,9 +98,12 @@ class AnnotatorService:
     - Multi-object detection
     - Normalized coordinate output (0-1000)
     - Robust JSON parsing and auto-repair
+    - Concurrent per-image requests via a thread pool
+    - Multi-image requests (annotate_batch) with per-image fallback
     """
     
-    def __init__(self, curated_folder: str = "data/curated", max_retries: int = 3):
+    def __init__(self, curated_folder: str = "data/curated", max_retries: int = 3, max_workers: int = 8,
+                 batch_size: int = 4):
         instructions = (
             "You are an Annotation Agent. Your goal is to detect objects in images and provide bounding boxes. "
             "You can detect single or multiple object types in an image. "
@@ -31,6 +115,15 @@ class AnnotatorService:
         self.model = get_gemini_model(system_instruction=instructions)
         self.curated_folder = curated_folder
         self.max_retries = max_retries
+        # Concurrent Gemini calls per annotate() batch; tune to your API tier
+        self.max_workers = max_workers
+        # Images annotated per model request by annotate_batch
+        self.batch_size = batch_size
+        # Bboxes from previous runs, keyed on query + phash (None if disabled)
+        self.cache = get_cache("annotator")
+        # ParallelAnnotatorAgent used by as_adk_tool, built on first use
+        self._parallel_agent = None
+        self.features = get_pipeline_features()
 
     def _parse_json_robust(self, text: str, filename: str) -> Optional[List[Dict]]:
         """
@@ -45,185 +138,174 @@ class AnnotatorService:
         """
         # Strategy 1: Direct parse
         try:
-            data = json.loads(text)
+            data = loads(text)
             return data
-        except json.JSONDecodeError:
+        except JSONDecodeError:
             pass
         
         # Strategy 2: Remove markdown code blocks
         if '```' in text:
             # Extract content between code fences
-            match = re.search(r'```(?:json)?\s*([\s\S]*?)```', text)
-            if match:
-                text = match.group(1).strip()
+            block = extract_code_block(text)
+            if block is not None:
+                text = block
                 try:
-                    data = json.loads(text)
-                    logger.debug(f"Parsed after removing markdown for {filename}")
+                    data = loads(text)
+                    logger.debug("Parsed after removing markdown for %s", filename)
                     return data
-                except json.JSONDecodeError:
+                except JSONDecodeError:
                     pass
         
         # Strategy 3: Fix common issues
         try:
             # Replace single quotes with double quotes (carefully)
-            fixed_text = re.sub(r"(?<!\\)'", '"', text)
+            fixed_text = normalize_quotes(text)
             # Remove trailing commas before closing brackets/braces
-            fixed_text = re.sub(r',\s*}', '}', fixed_text)
-            fixed_text = re.sub(r',\s*]', ']', fixed_text)
+            fixed_text = remove_trailing_commas(fixed_text)
             # Remove any text before the first '[' or '{'
-            match = re.search(r'[\[{]', fixed_text)
+            match = _JSON_START.search(fixed_text)
             if match:
                 fixed_text = fixed_text[match.start():]
             # Remove any text after the last ']' or '}'
-            match = re.search(r'[\]}](?!.*[\]}])', fixed_text)
-            if match:
-                fixed_text = fixed_text[:match.end()]
+            end = max(fixed_text.rfind(']'), fixed_text.rfind('}'))
+            if end != -1:
+                fixed_text = fixed_text[:end + 1]
             
-            data = json.loads(fixed_text)
-            logger.info(f"Fixed JSON formatting for {filename}")
+            data = loads(fixed_text)
+            logger.info("Fixed JSON formatting for %s", filename)
             return data
-        except json.JSONDecodeError:
+        except JSONDecodeError:
             pass
         
         # Strategy 4: Try to extract JSON array using regex
         try:
             # Look for array pattern
-            array_match = re.search(r'\[\s*{[\s\S]*}\s*]', text)
+            array_match = _JSON_ARRAY.search(text)
             if array_match:
                 potential_json = array_match.group(0)
                 # Apply fixes
-                potential_json = re.sub(r"(?<!\\)'", '"', potential_json)
-                potential_json = re.sub(r',\s*}', '}', potential_json)
-                potential_json = re.sub(r',\s*]', ']', potential_json)
-                data = json.loads(potential_json)
-                logger.info(f"Extracted JSON array for {filename}")
+                potential_json = normalize_quotes(potential_json)
+                potential_json = remove_trailing_commas(potential_json)
+                data = loads(potential_json)
+                logger.info("Extracted JSON array for %s", filename)
                 return data
-        except (json.JSONDecodeError, AttributeError):
+        except (JSONDecodeError, AttributeError):
             pass
         
         # Strategy 5: Try to find individual bbox objects and reconstruct
         try:
             # Look for bbox patterns like [ymin, xmin, ymax, xmax]
-            bbox_pattern = r'\[\s*\d+(?:\.\d+)?\s*,\s*\d+(?:\.\d+)?\s*,\s*\d+(?:\.\d+)?\s*,\s*\d+(?:\.\d+)?\s*]'
-            bboxes = re.findall(bbox_pattern, text)
+            bboxes = _BBOX.findall(text)
             if bboxes:
                 # Try to find labels
-                label_pattern = r'["\']?label["\']?\s*:\s*["\']([^"\'\']+)["\']'
-                labels = re.findall(label_pattern, text, re.IGNORECASE)
+                labels = _LABEL.findall(text)
                 
                 # Construct JSON
                 reconstructed = []
                 for i, bbox_str in enumerate(bboxes):
-                    bbox = json.loads(bbox_str)
+                    bbox = loads(bbox_str)
                     label = labels[i] if i < len(labels) else "unknown"
                     reconstructed.append({"label": label, "bbox": bbox})
                 
                 if reconstructed:
-                    logger.info(f"Reconstructed JSON from bbox patterns for {filename}")
+                    logger.info("Reconstructed JSON from bbox patterns for %s", filename)
                     return reconstructed
         except Exception:
             pass
         
         # All strategies failed
-        logger.warning(f"All JSON parsing strategies failed for {filename}")
-        logger.debug(f"Problematic text (first 300 chars): {text[:300]}...")
+        logger.warning("All JSON parsing strategies failed for %s", filename)
+        logger.debug("Problematic text (first 300 chars): %s...", text[:300])
         return None
 
-    def _annotate_single_image(self, img_path: str, query: str, objects: List[str], 
-                               width: int, height: int, retry_count: int = 0) -> Optional[Dict]:
+    def _clean_boxes(self, data: Any, query: str, filename: str, retry_count: int = 0) -> Optional[List[Dict]]:
+        """
+        Normalize parsed model output to a list of valid {"label", "bbox"} dicts.
+        
+        Args:
+            data: Parsed JSON for one image
+            query: Full query string (label for bare [ymin, xmin, ymax, xmax] lists)
+            filename: Filename for logging purposes
+            retry_count: Current retry attempt (0-indexed), for logging
+            
+        Returns:
+            Boxes within the 0-1000 range, or None if there are none
+        """
+        # Basic validation/fix
+        if isinstance(data, list) and len(data) > 0:
+            # If first element is a list, convert all list elements to dict format
+            if isinstance(data[0], list):
+                data = [{'label': query, 'bbox': box} for box in data if isinstance(box, list) and len(box) == 4]
+            # Ensure all items have the expected format
+            elif not isinstance(data[0], dict):
+                logger.warning("Unexpected annotation format for %s (attempt %s)", filename, retry_count + 1)
+                return None
+        else:
+            logger.warning("Invalid annotation format (not a list) for %s (attempt %s)", filename, retry_count + 1)
+            return None
+        
+        # Validate bounding boxes
+        valid_data = []
+        for item in data:
+            if 'bbox' in item and isinstance(item['bbox'], list) and len(item['bbox']) == 4:
+                # Check if bbox values are reasonable (0-1000 range)
+                bbox = item['bbox']
+                if all(0 <= coord <= 1000 for coord in bbox):
+                    valid_data.append(item)
+                else:
+                    logger.warning("Invalid bbox coordinates for %s: %s", filename, bbox)
+        
+        if not valid_data:
+            logger.warning("No valid bounding boxes for %s (attempt %s)", filename, retry_count + 1)
+            return None
+        return valid_data
+
+    def _annotate_single_image(self, record: ImageRecord, query: str, objects: List[str],
+                               retry_count: int = 0) -> Optional[Dict]:
         """
         Annotate a single image with retry logic.
         
         Args:
-            img_path: Path to image
+            record: Decoded image (upload copy plus original size)
             query: Full query string
             objects: List of object names to detect
-            width: Image width
-            height: Image height
             retry_count: Current retry attempt (0-indexed)
             
         Returns:
             Annotation data dict or None if failed
         """
+        img_path = record.path
+        width, height = record.width, record.height
         try:
-            image = Image.open(img_path)
-            
-            # Build prompt for single or multiple objects
+            # Build prompt for single or multiple objects (retries are more explicit)
             if len(objects) == 1:
-                if retry_count > 0:
-                    # On retry, be more explicit
-                    prompt = (
-                        f"Find ALL instances of {objects[0]} in this image. "
-                        "Return ONLY a JSON array of objects. Each object must have 'label' and 'bbox' keys. "
-                        "Format: [{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}]. "
-                        "Use normalized coordinates (0-1000). Example: [{\"label\": \"dog\", \"bbox\": [100, 200, 300, 400]}]. "
-                        "Return ONLY the JSON array, no other text."
-                    )
-                else:
-                    prompt = (
-                        f"Return bounding boxes for ALL instances of {objects[0]} in this image. "
-                        "Output ONLY valid JSON with double quotes: [{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}]. "
-                        "Use normalized coordinates (0-1000 range). No explanations, just JSON."
-                    )
+                template = _SINGLE_RETRY_PROMPT if retry_count > 0 else _SINGLE_PROMPT
+                prompt = template.format(obj=objects[0])
             else:
-                objects_list = ', '.join(objects)
-                if retry_count > 0:
-                    prompt = (
-                        f"Find ALL instances of these objects: {objects_list}. "
-                        "Return ONLY a JSON array. Each object must have 'label' and 'bbox' keys. "
-                        "Format: [{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}]. "
-                        "Use normalized coordinates (0-1000). Return ONLY the JSON array."
-                    )
-                else:
-                    prompt = (
-                        f"Return bounding boxes for ALL instances of these objects in this image: {objects_list}. "
-                        "Detect and label each object separately. "
-                        "Output ONLY valid JSON with double quotes: [{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}]. "
-                        "Use normalized coordinates (0-1000 range). No explanations, just JSON."
-                    )
+                template = _MULTI_RETRY_PROMPT if retry_count > 0 else _MULTI_PROMPT
+                prompt = template.format(objects_list=', '.join(objects))
             
-            response = self.model.generate_content([prompt, image])
+            response = self.model.generate_content([prompt, record.pil], generation_config=ANNOTATION_CONFIG)
             if not response or not response.text:
-                logger.warning(f"No response from model for {os.path.basename(img_path)} (attempt {retry_count + 1})")
+                logger.warning("No response from model for %s (attempt %s)", os.path.basename(img_path), retry_count + 1)
                 return None
             
             text = response.text.strip()
             
             # Use robust JSON parsing
-            data = self._parse_json_robust(text, os.path.basename(img_path))
-            
-            if data is None:
-                return None
-            
-            # Basic validation/fix
-            if isinstance(data, list) and len(data) > 0:
-                # If first element is a list, convert all list elements to dict format
-                if isinstance(data[0], list):
-                    data = [{'label': query, 'bbox': box} for box in data if isinstance(box, list) and len(box) == 4]
-                # Ensure all items have the expected format
-                elif not isinstance(data[0], dict):
-                    logger.warning(f"Unexpected annotation format for {os.path.basename(img_path)} (attempt {retry_count + 1})")
+            # Well-formed replies are parsed and validated in one pass
+            valid_data = decode_boxes(text) or None
+            if valid_data is None:
+                data = self._parse_json_robust(text, os.path.basename(img_path))
+                
+                if data is None:
+                    return None
+                
+                valid_data = self._clean_boxes(data, query, os.path.basename(img_path), retry_count)
+                if valid_data is None:
                     return None
-            else:
-                logger.warning(f"Invalid annotation format (not a list) for {os.path.basename(img_path)} (attempt {retry_count + 1})")
-                return None
-            
-            # Validate bounding boxes
-            valid_data = []
-            for item in data:
-                if 'bbox' in item and isinstance(item['bbox'], list) and len(item['bbox']) == 4:
-                    # Check if bbox values are reasonable (0-1000 range)
-                    bbox = item['bbox']
-                    if all(0 <= coord <= 1000 for coord in bbox):
-                        valid_data.append(item)
-                    else:
-                        logger.warning(f"Invalid bbox coordinates for {os.path.basename(img_path)}: {bbox}")
-            
-            if not valid_data:
-                logger.warning(f"No valid bounding boxes for {os.path.basename(img_path)} (attempt {retry_count + 1})")
-                return None
             
-            logger.info(f"Annotated: {os.path.basename(img_path)} -> {len(valid_data)} objects (attempt {retry_count + 1})")
+            logger.info("Annotated: %s -> %s objects (attempt %s)", os.path.basename(img_path), len(valid_data), retry_count + 1)
             
             return {
                 "bboxes": valid_data,
@@ -232,16 +314,91 @@ class AnnotatorService:
             }
             
         except Exception as e:
-            logger.error(f"Error annotating {os.path.basename(img_path)} (attempt {retry_count + 1}): {e}")
+            logger.error("Error annotating %s (attempt %s): %s", os.path.basename(img_path), retry_count + 1, e)
             return None
 
-    def annotate(self, query: str, image_paths: List[str]) -> Dict[str, Any]:
+    def _annotate_one(self, query: str, objects: List[str], image: Union[str, ImageRecord],
+                      stop_event: Optional[threading.Event] = None) -> Tuple[str, Optional[Dict]]:
+        """
+        Annotate one image, retrying failed attempts with backoff.
+        
+        Args:
+            query: Full query string
+            objects: List of object names to detect
+            image: Path to image, or a record already decoded upstream.
+                   The record's decoded image is released afterwards.
+            stop_event: Optional event; once set, remaining attempts are skipped
+            
+        Returns:
+            Tuple of (filename, annotation data or None if all attempts failed)
+        """
+        img_path = image.path if isinstance(image, ImageRecord) else image
+        filename = os.path.basename(img_path)
+        record = None
+        
+        try:
+            record = image if isinstance(image, ImageRecord) else ImageRecord.load(img_path)
+            if record is None:
+                return filename, None
+            
+            cache_key = f"{query.lower().strip()}::{record.phash_hex}" if self.cache is not None else None
+            
+            # Bboxes are normalized to 0-1000, so cached boxes apply at any resolution
+            if cache_key is not None:
+                cached_bboxes = self.cache.get(cache_key)
+                if cached_bboxes is not None:
+                    logger.debug("Cached annotation for %s", filename)
+                    return filename, {"bboxes": cached_bboxes, "width": record.width, "height": record.height}
+            
+            # Try annotation with retry logic
+            for attempt in range(self.max_retries):
+                if stop_event is not None and stop_event.is_set():
+                    logger.debug("Skipping %s, run is over", filename)
+                    return filename, None
+                
+                result = self._annotate_single_image(record, query, objects, retry_count=attempt)
+                
+                if result is not None:
+                    # Success!
+                    if attempt > 0:
+                        logger.info("✅ Successfully annotated %s after %s attempts", filename, attempt + 1)
+                    if cache_key is not None:
+                        self.cache.set(cache_key, result["bboxes"], expire=DEFAULT_TTL)
+                    return filename, result
+                
+                # Failed attempt - wait before retry (except on last attempt)
+                if attempt < self.max_retries - 1:
+                    wait_time = 1 + attempt  # Exponential backoff: 1s, 2s, 3s
+                    logger.info("⏳ Retrying %s in %ss... (attempt %s/%s)", filename, wait_time, attempt + 2, self.max_retries)
+                    if stop_event is not None:
+                        stop_event.wait(wait_time)
+                    else:
+                        time.sleep(wait_time)
+            
+            logger.error("❌ Failed to annotate %s after %s attempts", filename, self.max_retries)
+                
+        except Exception as e:
+            logger.error("Error processing %s: %s", filename, e, exc_info=True)
+        finally:
+            if record is not None:
+                record.close()
+        
+        return filename, None
+
+    def annotate(self, query: str, image_paths: List[Union[str, ImageRecord]],
+                 stop_event: Optional[threading.Event] = None) -> Dict[str, Any]:
         """
         Annotates a list of images with bounding boxes.
         
+        Several images are annotated on a max_workers thread pool; a single
+        image (as the streaming pipeline sends) runs in the calling thread.
+        
         Args:
             query: Object query (can be single like 'dog' or multiple like 'dog,cat,car')
-            image_paths: List of image paths to annotate
+            image_paths: List of image paths to annotate. ImageRecords from the
+                         curator are also accepted and are not re-opened.
+            stop_event: Optional event; once set, images not yet sent to the
+                        model (including pending retries) are skipped
             
         Returns:
             Dictionary mapping filenames to annotation data:
@@ -257,49 +414,155 @@ class AnnotatorService:
         objects = [q.strip() for q in query.split(',')]
         query_display = query if len(objects) == 1 else f"{len(objects)} objects ({query})"
         
-        logger.info(f"Labeling {len(image_paths)} images for '{query_display}'")
+        logger.info("Labeling %s images for '%s'", len(image_paths), query_display)
         
         annotations = {}
         
-        for img_path in image_paths:
-            filename = os.path.basename(img_path)
-            
-            try:
-                # Get image dimensions
-                with Image.open(img_path) as image:
-                    width, height = image.size
+        if len(image_paths) == 1:
+            # Nothing to overlap; skip creating and joining a pool for one image
+            filename, result = self._annotate_one(query, objects, image_paths[0], stop_event)
+            if result is not None:
+                annotations[filename] = result
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(self._annotate_one, query, objects, image, stop_event)
+                    for image in image_paths
+                ]
                 
-                # Try annotation with retry logic
-                result = None
-                for attempt in range(self.max_retries):
-                    result = self._annotate_single_image(
-                        img_path, query, objects, width, height, retry_count=attempt
-                    )
-                    
+                for future in as_completed(futures):
+                    filename, result = future.result()
                     if result is not None:
-                        # Success!
                         annotations[filename] = result
-                        if attempt > 0:
-                            logger.info(f"✅ Successfully annotated {filename} after {attempt + 1} attempts")
-                        break
-                    
-                    # Failed attempt - wait before retry (except on last attempt)
-                    if attempt < self.max_retries - 1:
-                        wait_time = 1 + attempt  # Exponential backoff: 1s, 2s, 3s
-                        logger.info(f"⏳ Retrying {filename} in {wait_time}s... (attempt {attempt + 2}/{self.max_retries})")
-                        time.sleep(wait_time)
-                
-                if result is None:
-                    logger.error(f"❌ Failed to annotate {filename} after {self.max_retries} attempts")
-                    
-            except Exception as e:
-                logger.error(f"Error processing {filename}: {e}", exc_info=True)
         
         success_rate = len(annotations) / len(image_paths) * 100 if image_paths else 0
-        logger.info(f"✅ Annotation completed: {len(annotations)}/{len(image_paths)} images ({success_rate:.1f}% success rate)")
+        logger.info("✅ Annotation completed: %s/%s images (%.1f%% success rate)", len(annotations), len(image_paths), success_rate)
         
         return annotations
 
+    def annotate_batch(self, query: str, images: List[Union[str, ImageRecord]],
+                       stop_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """
+        Annotate several images with a single model request.
+        
+        Cached images are answered without a request; the rest are sent
+        together and the returned list of box lists is split per image.
+        Images whose entry is missing or invalid (or the whole batch, if
+        the answer does not line up) fall back to annotate-one-with-retries.
+        Runs in the calling thread.
+        
+        Args:
+            query: Object query (can be single like 'dog' or multiple like 'dog,cat,car')
+            images: Image paths or ImageRecords; best kept to self.batch_size
+            stop_event: Optional event; once set, images not yet sent to the
+                        model are skipped
+            
+        Returns:
+            Dictionary mapping filenames to annotation data (as annotate())
+        """
+        objects = [q.strip() for q in query.split(',')]
+        annotations = {}
+        records = []
+        
+        try:
+            for image in images:
+                record = image if isinstance(image, ImageRecord) else ImageRecord.load(image)
+                if record is not None:
+                    records.append(record)
+            
+            pending = []
+            for record in records:
+                filename = os.path.basename(record.path)
+                cache_key = f"{query.lower().strip()}::{record.phash_hex}" if self.cache is not None else None
+                cached_bboxes = self.cache.get(cache_key) if cache_key is not None else None
+                if cached_bboxes is not None:
+                    logger.debug("Cached annotation for %s", filename)
+                    annotations[filename] = {"bboxes": cached_bboxes, "width": record.width, "height": record.height}
+                else:
+                    pending.append((record, cache_key))
+            
+            if stop_event is not None and stop_event.is_set():
+                return annotations
+            
+            results = None
+            if len(pending) > 1:
+                results = self._annotate_batch_request([record for record, _ in pending], query, objects)
+                if results is None:
+                    logger.warning("Batch annotation failed for %s images, retrying individually", len(pending))
+            
+            for i, (record, cache_key) in enumerate(pending):
+                filename = os.path.basename(record.path)
+                result = results[i] if results is not None else None
+                if result is None:
+                    filename, result = self._annotate_one(query, objects, record, stop_event)
+                elif cache_key is not None:
+                    self.cache.set(cache_key, result["bboxes"], expire=DEFAULT_TTL)
+                if result is not None:
+                    annotations[filename] = result
+        finally:
+            for record in records:
+                record.close()
+        
+        logger.info("✅ Batch annotation completed: %s/%s images", len(annotations), len(images))
+        return annotations
+
+    def _annotate_batch_request(self, records: List[ImageRecord], query: str,
+                                objects: List[str]) -> Optional[List[Optional[Dict]]]:
+        """
+        Send several images in one request.
+        
+        Returns:
+            List aligned with records (annotation data, or None for an image
+            without valid boxes), or None if the answer is unusable
+        """
+        objects_text = objects[0] if len(objects) == 1 else f"these objects: {', '.join(objects)}"
+        prompt = _BATCH_PROMPT.format(count=len(records), objects_text=objects_text)
+        # Label each image so the model can answer in order
+        parts = [prompt]
+        for i, record in enumerate(records, 1):
+            parts.extend([f"Image {i}:", record.pil])
+        
+        try:
+            response = self.model.generate_content(parts, generation_config=BATCH_ANNOTATION_CONFIG)
+            if not response or not response.text:
+                return None
+            data = self._parse_json_robust(response.text.strip(), f"batch of {len(records)}")
+        except Exception as e:
+            logger.error("Error annotating batch of %s images: %s", len(records), e)
+            return None
+        
+        if not isinstance(data, list) or len(data) != len(records):
+            logger.debug("Batch response does not match %s images: %s", len(records), data)
+            return None
+        
+        results = []
+        for record, boxes in zip(records, data):
+            valid_data = self._clean_boxes(boxes, query, os.path.basename(record.path))
+            if valid_data is None:
+                results.append(None)
+                continue
+            logger.info("Annotated: %s -> %s objects (batched)", os.path.basename(record.path), len(valid_data))
+            results.append({"bboxes": valid_data, "width": record.width, "height": record.height})
+        return results
+
+    def _parallel_annotator(self):
+        """
+        Get the ParallelAnnotatorAgent shared by this service's ADK tools.
+        
+        Built on first use, so its worker pool stays warm across tool
+        calls. It annotates through this service instead of creating
+        another one.
+        """
+        agent = self._parallel_agent
+        if agent is None:
+            quality_loop = None
+            if self.features.enable_quality_loop:
+                quality_loop = self.features.create_quality_loop(self)
+            # Use parallel annotator for performance (hardcoded for now as per original pipeline)
+            agent = _parallel_annotator_cls()(num_workers=3, quality_loop=quality_loop, service=self)
+            self._parallel_agent = agent
+        return agent
+
     def as_adk_tool(self, state):
         """
         Returns a callable tool function for ADK integration.
@@ -314,27 +577,17 @@ class AnnotatorService:
             """
             Annotate images using the AnnotatorService.
             """
-            logger.info(f"🔍 Annotating {len(images)} images")
-            
-            # Use parallel annotator for performance (hardcoded for now as per original pipeline)
-            from agents.parallel_annotator import ParallelAnnotatorAgent
-            from utils.pipeline_features import get_pipeline_features
-            
-            features = get_pipeline_features()
-            quality_loop = None
-            if features.enable_quality_loop:
-                quality_loop = features.create_quality_loop(self)
+            logger.info("🔍 Annotating %s images", len(images))
             
-            # Create parallel annotator on the fly
-            annotator = ParallelAnnotatorAgent(num_workers=3, quality_loop=quality_loop)
-            annotations = annotator.annotate_parallel(state.query, images)
+            annotations = self._parallel_annotator().annotate_parallel(
+                state.query, images, max_results=state.get_needed_count())
             
             state.record_annotation(len(annotations))
             
             # Add to dataset and check if target reached
             target_reached = state.add_annotations(annotations)
             
-            logger.info(f"✅ Annotated {len(annotations)} images. Progress: {state.current_count}/{state.target_count}")
+            logger.info("✅ Annotated %s images. Progress: %s/%s", len(annotations), state.current_count, state.target_count)
             
             return {
                 "status": "success",
@@ -1,17 +1,27 @@
 import os
-import shutil
-from PIL import Image
-import imagehash
+import asyncio
 from utils.logger import get_logger
 from utils.gemini_client import get_gemini_model
+from utils.async_utils import run_sync
+from utils.hash_index import BKTree
+from utils.disk_cache import get_cache, DEFAULT_TTL
+from utils.image_prep import ImageRecord
+from utils.file_manager import link_or_copy
+from utils.json_utils import loads, strip_code_fences
 
 logger = get_logger("curator")
 
+# JSON mode for batch verification: one "YES"/"NO" string per image, in order
+BATCH_VERDICT_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {"type": "ARRAY", "items": {"type": "STRING", "enum": ["YES", "NO"]}}
+}
+
 class CuratorService:
-    def __init__(self, raw_folder="data/raw", curated_folder="data/curated"):
+    def __init__(self, raw_folder="data/raw", curated_folder="data/curated", max_concurrency=5, batch_size=4):
         instructions = (
             "You are a Curator Agent. Your goal is to filter images to ensure they match the user's query. "
-            "You will be given an image and a query. "
+            "You will be given one or more images and a query. "
             "You must analyze the image and determine if it strictly contains the ACTUAL OBJECT visually present in the image. "
             "CRITICAL RULES: "
             "- The object must be VISUALLY PRESENT and clearly visible in the image. "
@@ -19,14 +29,22 @@ class CuratorService:
             "- Products or packaging that mention the object but don't show the actual object should be REJECTED. "
             "- For example: A box labeled 'hot dogs' does NOT contain a dog. A sign saying 'cat food' does NOT contain a cat. "
             "- Only accept images where the actual physical object can be clearly seen and identified. "
-            "Answer strictly with 'YES' or 'NO'."
+            "Answer strictly with 'YES' or 'NO' for each image, in the format requested."
         )
         self.model = get_gemini_model(system_instruction=instructions)
         self.raw_folder = raw_folder
         self.curated_folder = curated_folder
-        self.seen_hashes = []
+        # Hamming-distance index over packed phashes of images already seen
+        self.seen_hashes = BKTree()
+        # Max in-flight Gemini verification calls
+        self.max_concurrency = max_concurrency
+        # Images verified per model request
+        self.batch_size = batch_size
+        # Verdicts from previous runs, keyed on query + phash (None if disabled)
+        self.cache = get_cache("curator")
 
-    def curate(self, query: str, image_paths: list[str], max_count: int = None) -> list[str]:
+    def curate(self, query: str, image_paths: list[str], max_count: int = None,
+               batch_size: int = None) -> list[str]:
         """
         Curates a list of image paths by verifying they match the query.
         
@@ -35,72 +53,307 @@ class CuratorService:
             image_paths: List of image paths to curate
             max_count: Maximum number of images to curate (stops once reached). 
                       If None, curates all images.
+            batch_size: Images verified per model request (default: self.batch_size)
                       
         Returns:
             List of paths to images that passed curation.
         """
-        logger.info(f"Filtering {len(image_paths)} images for '{query}'" + 
-                    (f" (target: {max_count})" if max_count else ""))
+        return run_sync(self.curate_async(query, image_paths, max_count=max_count, batch_size=batch_size))
+
+    async def curate_async(self, query: str, image_paths: list[str], max_count: int = None,
+                           batch_size: int = None) -> list[str]:
+        """
+        Async variant of curate that verifies images concurrently.
+        
+        Args:
+            query: The object query to match
+            image_paths: List of image paths to curate
+            max_count: Maximum number of images to curate. If None, curates all images.
+            batch_size: Images verified per model request (default: self.batch_size)
+            
+        Returns:
+            List of paths to images that passed curation, in input order.
+        """
+        records = await self.load_records(image_paths)
+        kept = await self.curate_records_async(query, records, max_count=max_count, batch_size=batch_size)
+        for record in kept:
+            record.close()
+        return [record.path for record in kept]
+
+    async def load_records(self, image_paths: list[str]) -> list[ImageRecord]:
+        """
+        Decode images into ImageRecords on worker threads.
+        
+        Args:
+            image_paths: List of image paths
+            
+        Returns:
+            Records for the readable images, in input order. Files that are not
+            JPEG/PNG/WEBP images are skipped.
+        """
+        results = await asyncio.gather(
+            *(asyncio.to_thread(ImageRecord.load, img_path) for img_path in image_paths),
+            return_exceptions=True
+        )
+        
+        records = []
+        for img_path, result in zip(image_paths, results):
+            if isinstance(result, BaseException):
+                logger.error("Error processing %s: %s", os.path.basename(img_path), result)
+            elif result is not None:
+                records.append(result)
+        return records
+
+    async def curate_records_async(self, query: str, records: list[ImageRecord], max_count: int = None,
+                                   batch_size: int = None) -> list[ImageRecord]:
+        """
+        Curate already-decoded images.
         
+        Images are deduplicated first, then grouped into batches that are
+        verified with one multi-image request each. Batch requests are fanned
+        out together and bounded by a semaphore of size max_concurrency to
+        stay within API rate limits.
+        
+        Once max_count images are kept, batches that are still pending are
+        cancelled rather than awaited. Rejected and duplicate records are
+        closed. Kept records point at the
+        curated copy and keep their decoded image for the annotator; callers
+        should close() them once done.
+        
+        Args:
+            query: The object query to match
+            records: Records to curate
+            max_count: Maximum number of images to curate. If None, curates all images.
+            batch_size: Images verified per model request (default: self.batch_size)
+            
+        Returns:
+            List of kept records, in input order.
+        """
+        batch_size = batch_size or self.batch_size
+        logger.info("Filtering %s images for '%s'%s", len(records), query,
+                    f" (target: {max_count})" if max_count else "")
+        
+        # Deduplicate up front, in input order, so batches only hold novel images
+        novel = []
+        for record in records:
+            if self.seen_hashes.has_near(record.phash, 4):
+                logger.info("🔄 Duplicate found: %s", os.path.basename(record.path))
+                record.close()
+                continue
+            self.seen_hashes.add(record.phash)
+            novel.append(record)
+        
+        if novel:
+            os.makedirs(self.curated_folder, exist_ok=True)
+        
+        sem = asyncio.Semaphore(self.max_concurrency)
+        stop_event = asyncio.Event()
         kept_images = []
         
-        for img_path in image_paths:
-            # Stop if we've reached the target count
-            if max_count is not None and len(kept_images) >= max_count:
-                logger.info(f"Reached target of {max_count} curated images")
-                break
-            try:
-                image = Image.open(img_path)
-                
-                # Deduplication
-                img_hash = imagehash.phash(image)
-                is_duplicate = False
-                for seen_hash in self.seen_hashes:
-                    if img_hash - seen_hash < 5:
-                        logger.info(f"🔄 Duplicate found: {os.path.basename(img_path)}")
-                        is_duplicate = True
-                        break
-                
-                if is_duplicate:
-                    logger.debug(f"Duplicate found: {os.path.basename(img_path)}")
-                    continue
-                
-                self.seen_hashes.append(img_hash)
-                
-                # AI Verification - Strict prompt to avoid false positives
-                prompt = (
-                    f"Does this image contain the actual, visible {query} object? "
-                    f"IMPORTANT: The {query} must be physically present and clearly visible in the image. "
-                    f"REJECT if the image only shows: text mentioning '{query}', packaging/labels with '{query}' written on them, "
-                    f"or products that mention '{query}' but don't show the actual object. "
-                    f"Only answer YES if you can clearly see the actual {query} object in the image. "
-                    f"Answer strictly with YES or NO."
-                )
+        batches = [novel[i:i + batch_size] for i in range(0, len(novel), batch_size)]
+        tasks = [
+            asyncio.create_task(self._verify_batch(query, batch, sem, stop_event, kept_images, max_count))
+            for batch in batches
+        ]
+        
+        async def cancel_on_stop():
+            # Drop batches still queued on the semaphore or waiting on the model
+            await stop_event.wait()
+            for task in tasks:
+                task.cancel()
+        
+        watcher = asyncio.create_task(cancel_on_stop())
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            watcher.cancel()
+        
+        curated = []
+        for batch, result in zip(batches, results):
+            if isinstance(result, asyncio.CancelledError):
+                # A worker thread may still be uploading these; leave them to GC
+                continue
+            if isinstance(result, BaseException):
+                logger.error("Error verifying batch of %s images: %s", len(batch), result)
+                for record in batch:
+                    record.close()
+            else:
+                curated.extend(record for record in result if record)
                 
-                response = self.model.generate_content([prompt, image])
-                if not response or not response.text:
-                    logger.warning(f"No response from model for {os.path.basename(img_path)}")
+        logger.info("Finished. Kept %s images", len(curated))
+        return curated
+
+    async def _verify_batch(self, query: str, batch: list[ImageRecord], sem: asyncio.Semaphore,
+                            stop_event: asyncio.Event, kept_images: list, max_count: int = None) -> list:
+        """
+        Verify a batch of novel images and keep the ones that match.
+        
+        Cached verdicts are reused; the remaining images are sent to the
+        model together in a single request.
+        
+        Args:
+            query: The object query to match
+            batch: Records to verify
+            sem: Semaphore bounding concurrent model calls
+            stop_event: Set once max_count images have been kept
+            kept_images: Shared list of kept paths for this curation run
+            max_count: Maximum number of images to keep
+            
+        Returns:
+            List aligned with batch: the kept record, or None if rejected/skipped.
+        """
+        verdicts = {}
+        pending = []
+        for record in batch:
+            cache_key = f"{query.lower().strip()}::{record.phash_hex}"
+            verdict = self.cache.get(cache_key) if self.cache is not None else None
+            if verdict is None:
+                pending.append((record, cache_key))
+            else:
+                logger.debug("Cached verdict for %s", os.path.basename(record.path))
+                verdicts[record.path] = verdict
+        
+        if pending:
+            answers = await self._ask_model(query, [record for record, _ in pending], sem, stop_event)
+            for (record, cache_key), verdict in zip(pending, answers):
+                if verdict is None:
                     continue
-                    
-                answer = response.text.strip().upper()
-                
-                if "YES" in answer:
-                    # Ensure directory exists
-                    os.makedirs(self.curated_folder, exist_ok=True)
-                    dest_path = os.path.join(self.curated_folder, os.path.basename(img_path))
-                    shutil.copy(img_path, dest_path)
-                    kept_images.append(dest_path)
-                    logger.info(f"✅ Kept: {os.path.basename(img_path)}")
-                else:
-                    # Log rejection reason at INFO level to help debug
-                    logger.info(f"❌ Rejected: {os.path.basename(img_path)} | Reason: {response.text.strip()}")
-                    logger.debug(f"Full response: {response.text}")
-                    
+                verdicts[record.path] = verdict
+                if self.cache is not None:
+                    self.cache.set(cache_key, verdict, expire=DEFAULT_TTL)
+        
+        return [
+            self._keep_if_match(record, verdicts.get(record.path), stop_event, kept_images, max_count)
+            for record in batch
+        ]
+
+    async def _ask_model(self, query: str, records: list[ImageRecord], sem: asyncio.Semaphore,
+                         stop_event: asyncio.Event) -> list:
+        """
+        Get YES/NO verdicts for images, batching them into one request.
+        
+        Falls back to one request per image if the batched answer cannot be
+        parsed or does not line up with the images sent.
+        
+        Returns:
+            List of verdict strings aligned with records (None if unavailable)
+        """
+        if len(records) > 1:
+            verdicts = await self._ask_batch(query, records, sem, stop_event)
+            if verdicts is not None:
+                return verdicts
+            logger.warning("Batch verification failed for %s images, retrying individually", len(records))
+        
+        return list(await asyncio.gather(*(
+            self._ask_single(query, record, sem, stop_event) for record in records
+        )))
+
+    async def _ask_batch(self, query: str, records: list[ImageRecord], sem: asyncio.Semaphore,
+                         stop_event: asyncio.Event):
+        """Verify several images in one request. Returns None if the answer is unusable."""
+        # Label each image so the model can answer in order
+        parts = [self._batch_prompt(query, len(records))]
+        for i, record in enumerate(records, 1):
+            parts.extend([f"Image {i}:", record.pil])
+        
+        async with sem:
+            # Skip the model call entirely if the target was reached while waiting
+            if stop_event.is_set():
+                return [None] * len(records)
+            try:
+                # google-generativeai is synchronous, so run the call off the event loop
+                response = await asyncio.to_thread(self.model.generate_content, parts,
+                                                   generation_config=BATCH_VERDICT_CONFIG)
+                answers = loads(strip_code_fences(response.text))
             except Exception as e:
-                logger.error(f"Error processing {os.path.basename(img_path)}: {e}", exc_info=True)
-                
-        logger.info(f"Finished. Kept {len(kept_images)} images")
-        return kept_images
+                logger.debug("Unusable batch response: %s", e)
+                return None
+        
+        if (not isinstance(answers, list) or len(answers) != len(records)
+                or not all(isinstance(answer, str) for answer in answers)):
+            logger.debug("Batch response does not match %s images: %s", len(records), answers)
+            return None
+        return [answer.strip() for answer in answers]
+
+    async def _ask_single(self, query: str, record: ImageRecord, sem: asyncio.Semaphore,
+                          stop_event: asyncio.Event):
+        """Verify one image. Returns the raw verdict text, or None on failure."""
+        try:
+            async with sem:
+                if stop_event.is_set():
+                    return None
+                response = await asyncio.to_thread(self.model.generate_content, [self._single_prompt(query), record.pil])
+            
+            if not response or not response.text:
+                logger.warning("No response from model for %s", os.path.basename(record.path))
+                return None
+            return response.text.strip()
+            
+        except Exception as e:
+            logger.error("Error processing %s: %s", os.path.basename(record.path), e, exc_info=True)
+            return None
+
+    def _keep_if_match(self, record: ImageRecord, verdict: str, stop_event: asyncio.Event,
+                       kept_images: list, max_count: int = None):
+        """
+        Copy an accepted image to the curated folder.
+        
+        Returns:
+            The record, repointed at the curated copy, or None (record closed)
+            if the image was rejected or skipped.
+        """
+        filename = os.path.basename(record.path)
+        
+        if verdict is not None and "YES" not in verdict.upper():
+            # Log rejection reason at INFO level to help debug
+            logger.info("❌ Rejected: %s | Reason: %s", filename, verdict)
+            logger.debug("Full response: %s", verdict)
+            verdict = None
+        
+        if verdict is None or stop_event.is_set():
+            record.close()
+            return None
+        
+        try:
+            dest_path = os.path.join(self.curated_folder, filename)
+            link_or_copy(record.path, dest_path)
+        except Exception as e:
+            logger.error("Error processing %s: %s", filename, e, exc_info=True)
+            record.close()
+            return None
+        
+        record.path = dest_path
+        kept_images.append(dest_path)
+        logger.info("✅ Kept: %s", filename)
+        
+        if max_count is not None and len(kept_images) >= max_count:
+            logger.info("Reached target of %s curated images", max_count)
+            stop_event.set()
+        return record
+
+    @staticmethod
+    def _single_prompt(query: str) -> str:
+        # AI Verification - Strict prompt to avoid false positives
+        return (
+            f"Does this image contain the actual, visible {query} object? "
+            f"IMPORTANT: The {query} must be physically present and clearly visible in the image. "
+            f"REJECT if the image only shows: text mentioning '{query}', packaging/labels with '{query}' written on them, "
+            f"or products that mention '{query}' but don't show the actual object. "
+            f"Only answer YES if you can clearly see the actual {query} object in the image. "
+            f"Answer strictly with YES or NO."
+        )
+
+    @staticmethod
+    def _batch_prompt(query: str, count: int) -> str:
+        return (
+            f"You will be shown {count} images, labelled Image 1 to Image {count}. "
+            f"For EACH image, decide whether it contains the actual, visible {query} object. "
+            f"IMPORTANT: The {query} must be physically present and clearly visible in the image. "
+            f"REJECT images that only show: text mentioning '{query}', packaging/labels with '{query}' written on them, "
+            f"or products that mention '{query}' but don't show the actual object. "
+            f"Respond ONLY with a JSON list of {count} strings, \"YES\" or \"NO\", in image order "
+            f"(e.g. [\"YES\", \"NO\"])."
+        )
 
     def as_adk_tool(self, state):
         """
@@ -116,12 +369,12 @@ class CuratorService:
             """
             Curate images using the CuratorService.
             """
-            logger.info(f"🔍 Curating {len(images)} images")
+            logger.info("🔍 Curating %s images", len(images))
             
             curated = self.curate(state.query, images)
             
             state.record_curation(len(curated))
-            logger.info(f"✅ Curated {len(curated)} images")
+            logger.info("✅ Curated %s images", len(curated))
             
             return {"status": "success", "images": curated, "count": len(curated)}
             
@@ -1,7 +1,7 @@
 import json
 import os
 import datetime
-from tools.bbox_calculator import create_bbox_calculator, calculate_bbox
+from tools.bbox_calculator import create_bbox_calculator, calculate_bboxes
 from utils.logger import get_logger
 
 logger = get_logger("engineer")
@@ -39,9 +39,43 @@ class EngineerService:
 
     def process_item(self, filename, data):
         """Adds a single image's annotations to the COCO dataset."""
-        # Add Image
-        self.coco_data["images"].append({
-            "id": self.image_id,
+        self._merge_item(filename, *self._convert_item(filename, data))
+
+    def process_items(self, items):
+        """
+        Adds many images' annotations to the COCO dataset in one pass.
+        
+        Image sizes come from the annotation data, so no image is opened.
+        Entries are built in a local list and appended to the dataset with
+        one extend per section; the output is identical to calling
+        process_item for each item.
+        
+        Args:
+            items: Iterable of (filename, data) pairs, e.g. annotations.items()
+        """
+        images = []
+        annotations = []
+        for filename, data in items:
+            image_entry, item_annotations = self._convert_item(filename, data)
+            images.append({"id": self.image_id, **image_entry})
+            for annotation in item_annotations:
+                annotations.append({"id": self.annotation_id, "image_id": self.image_id, **annotation})
+                self.annotation_id += 1
+            self.image_id += 1
+            logger.debug(f"Engineered: {filename} ({len(item_annotations)} objects)")
+        
+        self.coco_data["images"].extend(images)
+        self.coco_data["annotations"].extend(annotations)
+        logger.info(f"Engineered {len(images)} images ({len(annotations)} objects)")
+
+    def _convert_item(self, filename, data):
+        """
+        Builds the COCO image entry and annotations for one image.
+        
+        Returns:
+            Tuple of (image entry, list of annotations), both without ids
+        """
+        image_entry = {
             "width": data["width"],
             "height": data["height"],
             "file_name": filename,
@@ -49,7 +83,8 @@ class EngineerService:
             "flickr_url": "",
             "coco_url": "",
             "date_captured": ""
-        })
+        }
+        annotations = []
         
         # Add Annotation
         # Expecting bboxes to be a list of dicts: {'label': 'cat', 'bbox': [ymin, xmin, ymax, xmax]}
@@ -57,6 +92,9 @@ class EngineerService:
         
         items = data["bboxes"]
         
+        # Validate and label every box first, then convert them in one vectorized step
+        normalized = []
+        category_ids = []
         for item in items:
             try:
                 if isinstance(item, list):
@@ -76,52 +114,45 @@ class EngineerService:
                     logger.warning(f"Invalid bbox format for {filename}: {bbox_norm} (expected list of 4 values)")
                     continue
                 
-                ymin, xmin, ymax, xmax = bbox_norm
-                
-                # Use code executor for reliable bbox calculations
-                calc_result = calculate_bbox(
-                    normalized_bbox=[ymin, xmin, ymax, xmax],
-                    image_width=data["width"],
-                    image_height=data["height"],
-                    calculator_agent=self.bbox_calculator
-                )
+                if not all(isinstance(coord, (int, float)) for coord in bbox_norm):
+                    logger.warning(f"Non-numeric bbox for {filename}: {bbox_norm}")
+                    continue
                 
-                if calc_result["status"] == "success":
-                    bbox = calc_result["bbox"]
-                    # Ensure we have exactly 4 values
-                    if len(bbox) == 4:
-                        abs_x, abs_y, abs_w, abs_h = bbox
-                    else:
-                        logger.warning(f"Invalid bbox length: {len(bbox)}, using fallback")
-                        abs_x = (xmin / 1000) * data["width"]
-                        abs_y = (ymin / 1000) * data["height"]
-                        abs_w = ((xmax - xmin) / 1000) * data["width"]
-                        abs_h = ((ymax - ymin) / 1000) * data["height"]
-                else:
-                    # Fallback to manual calculation if code executor fails
-                    logger.warning(f"Code executor failed, using fallback: {calc_result.get('error_message')}")
-                    abs_x = (xmin / 1000) * data["width"]
-                    abs_y = (ymin / 1000) * data["height"]
-                    abs_w = ((xmax - xmin) / 1000) * data["width"]
-                    abs_h = ((ymax - ymin) / 1000) * data["height"]
+                normalized.append(bbox_norm)
+                category_ids.append(category_id)
                 
-                self.coco_data["annotations"].append({
-                    "id": self.annotation_id,
-                    "image_id": self.image_id,
+            except Exception as e:
+                logger.error(f"Error processing bbox in {filename}: {e}", exc_info=True)
+                continue
+        
+        if normalized:
+            # [x, y, w, h, area] rows, as plain floats for JSON output
+            rows = calculate_bboxes(normalized, data["width"], data["height"]).tolist()
+            for category_id, (abs_x, abs_y, abs_w, abs_h, area) in zip(category_ids, rows):
+                annotations.append({
                     "category_id": category_id,
                     "segmentation": [],
-                    "area": abs_w * abs_h,
+                    "area": area,
                     "bbox": [abs_x, abs_y, abs_w, abs_h],
                     "iscrowd": 0
                 })
-                
-                self.annotation_id += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing bbox in {filename}: {e}", exc_info=True)
-                continue
+        
+        return image_entry, annotations
+
+    def _merge_item(self, filename, image_entry, annotations):
+        """Assigns ids to a converted item and appends it to the dataset."""
+        self.coco_data["images"].append({"id": self.image_id, **image_entry})
+        
+        for annotation in annotations:
+            self.coco_data["annotations"].append({
+                "id": self.annotation_id,
+                "image_id": self.image_id,
+                **annotation
+            })
+            self.annotation_id += 1
+        
         self.image_id += 1
-        logger.info(f"Engineered: {filename} ({len(items)} objects)")
+        logger.info(f"Engineered: {filename} ({len(annotations)} objects)")
 
     def save(self):
         """Saves the current COCO dataset to disk."""
@@ -139,7 +170,6 @@ class EngineerService:
         # Create a new instance for batch processing
         engineer = EngineerService(output_folder=self.output_folder, query=query)
         
-        for filename, data in annotations.items():
-            engineer.process_item(filename, data)
+        engineer.process_items(annotations.items())
             
         return engineer.save()
@@ -1,13 +1,20 @@
 import os
-from typing import List, Dict, Optional
-import imagehash
-from PIL import Image
+import threading
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Dict, Optional
 from tools.search_tool import google_search_images
 from utils.file_manager import save_image
+from utils.hash_index import BKTree
+from utils.image_prep import compute_phash
 from utils.logger import get_logger
+from utils.mining_index import get_mining_index
 
 logger = get_logger("miner")
 
+# Search pages fetched per round when earlier runs already downloaded the results
+MAX_SEARCH_PAGES = 5
+
 class MinerService:
     """
     Service responsible for discovering and downloading images.
@@ -18,10 +25,19 @@ class MinerService:
     - Automatic pagination management
     """
     
-    def __init__(self, download_folder: str = "data/raw"):
+    def __init__(self, download_folder: str = "data/raw", max_workers: int = 16):
         self.download_folder = download_folder
+        # Max concurrent image downloads per mining round
+        self.max_workers = max_workers
         self.search_index = 1
-        self.seen_hashes = []
+        # Hamming-distance index over packed phashes of downloaded images
+        self.seen_hashes = BKTree()
+        # Hashes and URLs from earlier runs (None if caching is disabled)
+        self.index = get_mining_index()
+        self._loaded_queries = set()
+        # Files yielded so far; a duplicate download can land on the same
+        # (content-named) path and must not delete the kept copy
+        self._kept_paths = set()
 
     def mine(self, query: str, max_images: int = 10) -> Dict:
         """
@@ -38,66 +54,8 @@ class MinerService:
             - count: Number of images saved
             - errors: List of error messages (optional)
         """
-        logger.info(f"Mining {max_images} images for '{query}' starting at index {self.search_index}")
-        
-        # Call search tool directly (no LLM needed for deterministic search)
-        search_result = google_search_images(
-            query=query,
-            num_images=max_images,
-            start_index=self.search_index
-        )
-        
-        if search_result["status"] == "error":
-            logger.error(f"Search failed: {search_result['error_message']}")
-            return search_result
-        
-        urls = search_result["data"]
-        logger.info(f"Found {len(urls)} image URLs")
-        
-        saved_paths = []
         errors = []
-        
-        for url in urls:
-            if len(saved_paths) >= max_images:
-                break
-            
-            logger.debug(f"Downloading: {url[:60]}...")
-            saved_path = save_image(url, self.download_folder)
-            
-            if saved_path:
-                # Deduplication check
-                try:
-                    with Image.open(saved_path) as img:
-                        img_hash = imagehash.phash(img)
-                    
-                    # Check if duplicate
-                    is_duplicate = False
-                    for seen_hash in self.seen_hashes:
-                        if img_hash - seen_hash < 5:  # Hamming distance threshold
-                            logger.debug(f"Duplicate detected: {saved_path}")
-                            is_duplicate = True
-                            break
-                    
-                    if is_duplicate:
-                        os.remove(saved_path)
-                        continue
-                    
-                    # Not a duplicate - keep it
-                    self.seen_hashes.append(img_hash)
-                    saved_paths.append(saved_path)
-                    logger.debug(f"Saved: {saved_path}")
-                    
-                except Exception as e:
-                    logger.warning(f"Error processing {saved_path}: {e}")
-                    if os.path.exists(saved_path):
-                        os.remove(saved_path)
-                    errors.append(f"Processing failed: {url[:50]}")
-            else:
-                logger.warning(f"Failed to download: {url[:60]}...")
-                errors.append(f"Download failed: {url[:50]}")
-        
-        # Update search index for next call
-        self.search_index = search_result.get("next_index", self.search_index + max_images)
+        saved_paths = list(self.mine_stream(query, max_images, errors))
         
         if saved_paths:
             logger.info(f"✅ Mining completed: {len(saved_paths)} images saved")
@@ -118,6 +76,146 @@ class MinerService:
                 "errors": errors
             }
 
+    def mine_stream(self, query: str, max_images: int = 10, errors: Optional[List[str]] = None,
+                    stop_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Search once and yield each image path as soon as it is downloaded.
+        
+        Lets downstream stages start on the first images while the rest of
+        the batch is still downloading. URLs and near-duplicates already
+        downloaded for this query (in this or earlier runs) are skipped.
+        
+        Args:
+            query: Search query string
+            max_images: Number of images to attempt to download
+            errors: Optional list that download/search error messages are appended to
+            stop_event: Optional event; once set, the stream ends at the next
+                        finished download and cancels the rest
+            
+        Yields:
+            Paths of saved, non-duplicate images
+        """
+        if errors is None:
+            errors = []
+        
+        logger.info(f"Mining {max_images} images for '{query}' starting at index {self.search_index}")
+        query_key = query.lower().strip()
+        self._load_known_hashes(query_key)
+        
+        # Call search tool directly (no LLM needed for deterministic search).
+        # Results downloaded by earlier runs are dropped, so page on until
+        # there are enough new URLs.
+        urls = []
+        for _ in range(MAX_SEARCH_PAGES):
+            search_result = google_search_images(
+                query=query,
+                num_images=max_images,
+                start_index=self.search_index
+            )
+            
+            if search_result["status"] == "error":
+                logger.error(f"Search failed: {search_result['error_message']}")
+                errors.append(f"Search failed: {search_result['error_message']}")
+                break
+            
+            # Update search index for next call
+            self.search_index = search_result.get("next_index", self.search_index + max_images)
+            
+            found = search_result["data"]
+            fresh = self.index.unseen_urls(found) if self.index is not None else found
+            if len(fresh) < len(found):
+                logger.info(f"Skipping {len(found) - len(fresh)} previously downloaded URLs")
+            urls.extend(fresh)
+            if len(urls) >= max_images or not found:
+                break
+        
+        if not urls:
+            return
+        urls = list(dict.fromkeys(urls))
+        logger.info(f"Found {len(urls)} image URLs")
+        
+        saved_count = 0
+        # Duplicates and unreadable downloads, deleted together once the round ends
+        discarded = []
+        # Downloads run concurrently; hashing and dedup stay on this thread
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download")
+        try:
+            futures = {executor.submit(save_image, url, self.download_folder): url for url in urls}
+            for future in as_completed(futures):
+                if saved_count >= max_images or (stop_event is not None and stop_event.is_set()):
+                    break
+                
+                url = futures[future]
+                saved_path = future.result()
+                
+                if saved_path:
+                    if self.index is not None:
+                        self.index.add_url(query_key, url)
+                    
+                    # Deduplication check
+                    try:
+                        img_hash = self._phash(saved_path)
+                        
+                        # Check if duplicate (Hamming distance < 5)
+                        if self.seen_hashes.has_near(img_hash, 4):
+                            logger.debug(f"Duplicate detected: {saved_path}")
+                            discarded.append(saved_path)
+                            continue
+                        
+                        # Not a duplicate - keep it
+                        self.seen_hashes.add(img_hash)
+                        if self.index is not None:
+                            self.index.add_hash(query_key, img_hash)
+                        
+                    except Exception as e:
+                        logger.warning(f"Error processing {saved_path}: {e}")
+                        discarded.append(saved_path)
+                        errors.append(f"Processing failed: {url[:50]}")
+                        continue
+                    
+                    saved_count += 1
+                    self._kept_paths.add(saved_path)
+                    logger.debug(f"Saved: {saved_path}")
+                    yield saved_path
+                else:
+                    logger.warning(f"Failed to download: {url[:60]}...")
+                    errors.append(f"Download failed: {url[:50]}")
+        finally:
+            # Drop downloads not started yet (early stop or consumer closed the stream)
+            executor.shutdown(wait=False, cancel_futures=True)
+            for path in discarded:
+                if path in self._kept_paths:
+                    continue
+                with suppress(FileNotFoundError):
+                    os.unlink(path)
+
+    def _phash(self, path: str) -> int:
+        """
+        Phash of a downloaded file, reusing the one stored by an earlier download.
+
+        save_image names files after an MD5 of their bytes, so the file name
+        identifies the content and is a safe cache key.
+        """
+        if self.index is None:
+            return compute_phash(path)
+        name = os.path.basename(path)
+        img_hash = self.index.file_hash(name)
+        if img_hash is None:
+            img_hash = compute_phash(path)
+            self.index.add_file_hash(name, img_hash)
+        return img_hash
+
+    def _load_known_hashes(self, query_key: str):
+        """Add phashes kept by earlier runs for this query to the dedup index."""
+        if self.index is None or query_key in self._loaded_queries:
+            return
+        self._loaded_queries.add(query_key)
+        known = self.index.hashes(query_key)
+        for image_hash in known:
+            self.seen_hashes.add(image_hash)
+        if known:
+            logger.info(f"Loaded {len(known)} known image hashes for '{query_key}'")
+
     def as_adk_tool(self, state):
         """
         Returns a callable tool function for ADK integration.
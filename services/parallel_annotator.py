@@ -1,6 +1,10 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from services.annotator import AnnotatorService
+from utils.async_utils import run_sync
+from utils.image_prep import prefetch_files
 from utils.logger import get_logger
 
 logger = get_logger("parallel_annotator")
@@ -8,52 +12,157 @@ logger = get_logger("parallel_annotator")
 class ParallelAnnotatorAgent:
     """
     Manages parallel execution of annotation tasks.
+    
+    Keeps one thread pool for its lifetime, so repeated batches reuse warm
+    workers instead of spinning up a new pool per call. Each worker sends
+    batch_size images per model request. With a quality loop,
+    annotate_parallel refines each image through the loop instead (see
+    AnnotationRefinementLoop.annotate_many_with_refinement).
     """
     
-    def __init__(self, num_workers: int = 3, quality_loop = None):
+    def __init__(self, num_workers: int = 3, quality_loop = None, service: AnnotatorService = None,
+                 batch_size: int = None):
         self.num_workers = num_workers
         self.quality_loop = quality_loop
-        self.service = AnnotatorService()
+        # Reuse the caller's service (model handle, cache) when given
+        self.service = service or AnnotatorService()
+        # Images per model request (default: the service's batch_size)
+        self.batch_size = batch_size or self.service.batch_size
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the worker pool on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.num_workers,
+                                                    thread_name_prefix="annotator")
+            return self._executor
 
-    def annotate_parallel(self, query: str, image_paths: List[str]) -> Dict[str, Any]:
+    def annotate_parallel(self, query: str, image_paths: List[str], max_results: int = None) -> Dict[str, Any]:
         """
-        Annotates images in parallel using ThreadPoolExecutor.
+        Annotates images in parallel.
+        
+        Images are grouped batch_size per model request.
+        Fewer groups than num_workers are annotated in the calling thread;
+        otherwise this runs annotate_parallel_async to completion. With a
+        quality loop, images are refined num_workers at a time while
+        upcoming ones are decoded.
+        
+        Args:
+            query: Object(s) to annotate
+            image_paths: Images to annotate
+            max_results: Stop once this many images are annotated; requests
+                         not started yet are skipped instead of spending model calls
+            
+        Returns:
+            Dict mapping filename to annotation data
         """
-        logger.info(f"🚀 Starting parallel annotation with {self.num_workers} workers for {len(image_paths)} images")
+        if self.quality_loop:
+            return self.quality_loop.annotate_many_with_refinement(
+                image_paths, query, max_concurrent=self.num_workers, max_results=max_results)
         
-        results = {}
+        chunks = self._chunks(image_paths)
+        if len(chunks) >= self.num_workers:
+            return run_sync(self.annotate_parallel_async(query, image_paths, max_results=max_results))
         
-        # Helper function for a single task
-        def annotate_single(path):
-            # AnnotatorService.annotate expects a list of paths and returns a dict
-            return self.service.annotate(query, [path])
+        # Too few requests to overlap; skip the pool hand-off
+        results = {}
+        for i, chunk in enumerate(chunks):
+            self._prefetch(chunks, i + 1)
+            try:
+                results.update(self._annotate_chunk(query, chunk))
+            except Exception as e:
+                logger.error(f"Worker failed for {chunk}: {e}")
+            if max_results is not None and len(results) >= max_results:
+                break
+        return results
 
-        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
-            future_to_path = {executor.submit(annotate_single, path): path for path in image_paths}
+    async def annotate_parallel_async(self, query: str, image_paths: List[str],
+                                      max_results: int = None) -> Dict[str, Any]:
+        """
+        Async variant of annotate_parallel.
+        
+        One task per request group, with a semaphore keeping num_workers
+        requests in flight. The model clients are synchronous, so each
+        request runs on this agent's persistent worker pool rather than
+        blocking the event loop. Groups wait on the semaphore, not in the
+        pool's queue, so once max_results is reached the rest never start.
+        With a quality loop, the refinement pool runs on a worker thread.
+        
+        Args:
+            query: Object(s) to annotate
+            image_paths: Images to annotate
+            max_results: Stop once this many images are annotated
             
-            for future in as_completed(future_to_path):
-                path = future_to_path[future]
+        Returns:
+            Dict mapping filename to annotation data
+        """
+        if self.quality_loop:
+            return await asyncio.to_thread(self.quality_loop.annotate_many_with_refinement, image_paths, query,
+                                           max_concurrent=self.num_workers, max_results=max_results)
+        
+        logger.info(f"🚀 Starting parallel annotation with {self.num_workers} workers for {len(image_paths)} images")
+        
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        sem = asyncio.Semaphore(self.num_workers)
+        target_reached = asyncio.Event()
+        results = {}
+        skipped = 0
+        
+        chunks = self._chunks(image_paths)
+        
+        async def annotate_chunk(index: int, chunk: List[str]):
+            nonlocal skipped
+            async with sem:
+                if target_reached.is_set():
+                    skipped += len(chunk)
+                    return
+                # Warm the group that takes this slot next
+                self._prefetch(chunks, index + self.num_workers)
                 try:
-                    annotation = future.result()
-                    if annotation:
-                        # If quality loop is enabled, verify the annotation
-                        if self.quality_loop:
-                            # Extract the single item from the dict
-                            filename = list(annotation.keys())[0]
-                            data = annotation[filename]
-                            
-                            # Verify
-                            is_valid, feedback = self.quality_loop.verify_annotation(path, data["bboxes"], query)
-                            
-                            if is_valid:
-                                results.update(annotation)
-                            else:
-                                filename = list(annotation.keys())[0]
-                                logger.warning(f"Quality Loop rejected {filename}: {feedback}")
-                        else:
-                            results.update(annotation)
-                            
+                    annotations = await loop.run_in_executor(executor, self._annotate_chunk, query, chunk)
                 except Exception as e:
-                    logger.error(f"Worker failed for {path}: {e}")
+                    logger.error(f"Worker failed for {chunk}: {e}")
+                    return
+            
+            results.update(annotations)
+            if max_results is not None and len(results) >= max_results:
+                target_reached.set()
         
+        await asyncio.gather(*(annotate_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+        if skipped:
+            logger.info(f"Target reached, skipped {skipped} queued annotations")
         return results
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker pool; a later annotate_parallel starts a new one."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "ParallelAnnotatorAgent":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+
+    def _chunks(self, image_paths: List[str]) -> List[List[str]]:
+        """Split images into per-request groups."""
+        size = max(1, self.batch_size)
+        return [image_paths[i:i + size] for i in range(0, len(image_paths), size)]
+
+    @staticmethod
+    def _prefetch(chunks: List[List[str]], index: int):
+        """Start reading a later group's files from disk while requests are in flight."""
+        if index < len(chunks):
+            prefetch_files(chunks[index])
+
+    def _annotate_chunk(self, query: str, paths: List[str]) -> Dict[str, Any]:
+        """Annotate a group of images, as one request when there are several."""
+        if len(paths) == 1:
+            # AnnotatorService.annotate expects a list of paths and returns a dict
+            return self.service.annotate(query, paths)
+        return self.service.annotate_batch(query, paths)
@@ -2,13 +2,207 @@
 Quality refinement loop for annotations using iterative validation.
 """
 import os
-import json
-from PIL import Image
+import queue
+import hashlib
+import itertools
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from utils.config_loader import get_config
+from utils.disk_cache import get_cache, DEFAULT_TTL
 from utils.gemini_client import get_gemini_model
+from utils.image_prep import MAX_API_EDGE, ImageRecord, prepare_for_api, read_file
+from utils.json_utils import JSONDecodeError, decode_boxes, dumps, parse_llm_json, strip_code_fences
 from utils.logger import get_logger
 
 logger = get_logger("quality_loop")
 
+# Mean best-match IoU above which consecutive iterations count as converged
+CONVERGENCE_IOU = 0.95
+
+# Preference between verdicts when picking the annotation to return
+_STATUS_RANK = {"APPROVED": 2, "NEEDS_IMPROVEMENT": 1}
+
+# Part of every cached verdict's key; bump when the validation prompts change
+PROMPT_VERSION = "v1"
+
+# Recent verdicts kept per image in the refinement loop, and the largest
+# Jaccard distance between quantized box sets for a verdict to be reused
+VERDICT_WINDOW = 5
+VERDICT_REUSE_DISTANCE = 0.05
+# Grid (in normalized 0-1000 units) boxes are snapped to before comparing
+BOX_QUANTUM = 10
+
+# Box/label colour for visual validation, as RGB so PIL skips the colour-name lookup
+BOX_COLOR = (255, 0, 0)
+
+# Generation settings: greedy decoding, JSON mode and an output cap (which
+# also covers thinking tokens on 2.5 models)
+_VALIDATION_CONFIG = {
+    "temperature": 0.0,
+    "max_output_tokens": 2048,
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "OBJECT",
+        "properties": {
+            "status": {"type": "STRING", "enum": ["APPROVED", "NEEDS_IMPROVEMENT"]},
+            "feedback": {"type": "STRING"},
+            "issues": {"type": "ARRAY", "items": {"type": "STRING"}}
+        },
+        "required": ["status", "feedback"]
+    }
+}
+_ANNOTATION_CONFIG = {
+    "temperature": 0.0,
+    "max_output_tokens": 4096,
+    "response_mime_type": "application/json"
+}
+
+# Prompts, filled in with str.format per request
+_VALIDATION_REPLY = "Return JSON: {{\"status\": \"APPROVED\" or \"NEEDS_IMPROVEMENT\", \"feedback\": \"...\", \"issues\": [...]}}"
+_COORDINATE_PROMPT = (
+    "Validate these bounding box annotations for '{query}':\n"
+    "Number of boxes: {count}\n"
+    "Bounding boxes as [label, ymin, xmin, ymax, xmax] (normalized 0-1000): {bboxes_json}\n\n"
+    "Check for:\n"
+    "1. Completeness: Are all objects detected?\n"
+    "2. Accuracy: Are boxes properly fitted?\n"
+    "3. Correctness: No false positives?\n\n"
+    + _VALIDATION_REPLY
+)
+_VISUAL_PROMPT = (
+    "This image shows bounding box annotations for '{query}'.\n"
+    "The RED BOXES show the detected objects.\n"
+    "Number of boxes: {count}\n\n"
+    "Evaluate the annotations:\n"
+    "1. Are all instances of the object detected?\n"
+    "2. Do the boxes properly cover the entire object?\n"
+    "3. Are there any false positives (boxes on wrong objects)?\n\n"
+    + _VALIDATION_REPLY
+)
+_ANNOTATION_FORMAT = (
+    "Output ONLY valid JSON: [{{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}}]. "
+    "Use normalized coordinates (0-1000 range)."
+)
+_ANNOTATE_PROMPT = "Annotate ALL instances of '{query}' in this image. " + _ANNOTATION_FORMAT
+# Stand-in feedback for a refinement request sent before the real verdict is in
+_SPECULATIVE_FEEDBACK = "Check for missed instances and tighten any loosely fitted boxes."
+_REFINE_PROMPT = (
+    "Annotate ALL instances of '{query}' in this image. "
+    "Previous feedback: {feedback} "
+    "Improve the annotations based on this feedback. "
+    + _ANNOTATION_FORMAT
+)
+
+def _iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of [ymin, xmin, ymax, xmax] boxes.
+    
+    Args:
+        a: (N, 4) array
+        b: (M, 4) array
+        
+    Returns:
+        (N, M) array of intersection-over-union values
+    """
+    top = np.maximum(a[:, None, 0], b[None, :, 0])
+    left = np.maximum(a[:, None, 1], b[None, :, 1])
+    bottom = np.minimum(a[:, None, 2], b[None, :, 2])
+    right = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(bottom - top, 0, None) * np.clip(right - left, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def _boxes_converged(previous: list, current: list) -> bool:
+    """
+    Whether two iterations' boxes are effectively the same answer.
+    
+    Requires the same labels (as a multiset) and a mean best-match IoU
+    above CONVERGENCE_IOU, so small coordinate jitter still counts.
+    """
+    if previous is None or len(previous) != len(current):
+        return False
+    if previous == current:
+        return True
+    if sorted(str(b.get('label', '')) for b in previous) != sorted(str(b.get('label', '')) for b in current):
+        return False
+    prev = np.asarray([b['bbox'] for b in previous], dtype=np.float64).reshape(-1, 4)
+    cur = np.asarray([b['bbox'] for b in current], dtype=np.float64).reshape(-1, 4)
+    return float(_iou_matrix(cur, prev).max(axis=1).mean()) > CONVERGENCE_IOU
+
+
+def _compact_boxes(bboxes: list) -> str:
+    """
+    Serialize boxes for a prompt as [label, ymin, xmin, ymax, xmax] rows.
+    
+    Dropping the repeated "label"/"bbox" keys and rounding coordinates to
+    whole units keeps the prompt short; prompt tokens grow with box count.
+    """
+    return dumps([[b.get('label', 'object'), *(round(c) for c in b['bbox'])] for b in bboxes])
+
+
+def _box_signature(bboxes: list) -> frozenset:
+    """Boxes as a set of (label, coordinates snapped to BOX_QUANTUM) tuples."""
+    return frozenset(
+        (b.get('label', ''), *(round(c / BOX_QUANTUM) for c in b['bbox']))
+        for b in bboxes
+    )
+
+
+def _find_verdict(window: deque, signature: frozenset):
+    """Return a verdict from window whose box set is within VERDICT_REUSE_DISTANCE, or None."""
+    for cached_signature, verdict in window:
+        union = len(signature | cached_signature)
+        if union and len(signature ^ cached_signature) / union < VERDICT_REUSE_DISTANCE:
+            return verdict
+    return None
+
+
+def _load_record(path: str) -> Optional[ImageRecord]:
+    """ImageRecord.load that logs and returns None for unreadable files."""
+    try:
+        return ImageRecord.load(path)
+    except OSError as e:
+        logger.warning("Could not read %s: %s", path, e)
+        return None
+
+
+def _prefetch_images(paths: List[str], num_workers: int = 4):
+    """
+    Decode images on a thread pool, yielding them as they finish.
+    
+    PIL releases the GIL while reading and decoding, so several files
+    decode at once. At most 2 * num_workers images are in flight, so
+    memory stays bounded however slowly the consumer runs.
+    
+    Args:
+        paths: Images to load
+        num_workers: Decoding threads
+    
+    Yields:
+        (path, ImageRecord or None) in completion order
+    """
+    pending = iter(paths)
+    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="image-decode") as executor:
+        in_flight = {}
+        for path in itertools.islice(pending, 2 * num_workers):
+            in_flight[executor.submit(_load_record, path)] = path
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                next_path = next(pending, None)
+                if next_path is not None:
+                    in_flight[executor.submit(_load_record, next_path)] = next_path
+                yield path, future.result()
+
+
 class ValidatorService:
     """Service that validates annotation quality."""
     
@@ -27,44 +221,61 @@ class ValidatorService:
             "Be strict but fair. Only approve high-quality annotations."
         )
         self.model = get_gemini_model(system_instruction=instructions)
+        # Runs hybrid validation's coordinate check alongside the visual one;
+        # threads are only started on first use
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="validator")
+        # Label font, resolved once instead of on every draw.text call
+        self._font = ImageFont.load_default()
+        # Verdicts from earlier calls, keyed on image + query + boxes (None if disabled)
+        self.cache = get_cache("validator")
         
-    def _draw_boxes_on_image(self, image_path: str, bboxes: list) -> Image:
+    def _draw_boxes_on_image(self, image_path: str, bboxes: list, image: Image.Image = None) -> Image:
         """
         Draw bounding boxes on image for visual validation.
         
+        Boxes are drawn on a canvas no larger than MAX_API_EDGE, the size the
+        model works at anyway; a larger image passed in is downscaled first
+        rather than copied and uploaded at full resolution.
+        
         Args:
             image_path: Path to image
             bboxes: List of bounding boxes to draw
+            image: Already-loaded image to draw over (left unmodified)
             
         Returns:
-            PIL Image with boxes drawn
+            PIL Image with boxes drawn (a copy)
         """
-        from PIL import ImageDraw, ImageFont
-        
-        image = Image.open(image_path)
+        if image is None:
+            image = prepare_for_api(image_path)
+        scale = MAX_API_EDGE / max(image.size)
+        if scale < 1:
+            # resize() returns a new image, so no full-size copy is made
+            image = image.resize((round(image.width * scale), round(image.height * scale)),
+                                 Image.Resampling.BILINEAR)
+        else:
+            image = image.copy()
         draw = ImageDraw.Draw(image)
         width, height = image.size
         
-        for i, bbox_data in enumerate(bboxes):
-            bbox = bbox_data['bbox']  # [ymin, xmin, ymax, xmax] in 0-1000
+        # Convert normalized [ymin, xmin, ymax, xmax] (0-1000) to pixels in one pass
+        coords = np.asarray([b['bbox'] for b in bboxes], dtype=np.float64).reshape(-1, 4)
+        scale = np.array([height, width, height, width], dtype=np.float64) / 1000
+        pixels = (coords * scale).astype(np.int64).tolist()
+        
+        for i, (bbox_data, (ymin, xmin, ymax, xmax)) in enumerate(zip(bboxes, pixels)):
             label = bbox_data.get('label', 'object')
             
-            # Convert normalized coordinates to pixels
-            ymin = int((bbox[0] / 1000) * height)
-            xmin = int((bbox[1] / 1000) * width)
-            ymax = int((bbox[2] / 1000) * height)
-            xmax = int((bbox[3] / 1000) * width)
-            
             # Draw rectangle
-            draw.rectangle([xmin, ymin, xmax, ymax], outline="red", width=4)
+            draw.rectangle([xmin, ymin, xmax, ymax], outline=BOX_COLOR, width=4)
             
             # Draw label
             label_text = f"{label} #{i+1}"
-            draw.text((xmin + 5, ymin + 5), label_text, fill="red")
+            draw.text((xmin + 5, ymin + 5), label_text, fill=BOX_COLOR, font=self._font)
         
         return image
     
-    def validate(self, image_path: str, query: str, bboxes: list, method: str = "coordinate") -> dict:
+    def validate(self, image_path: str, query: str, bboxes: list, method: str = "coordinate",
+                 image: Image.Image = None) -> dict:
         """
         Validate annotation quality using specified method.
         
@@ -72,38 +283,67 @@ class ValidatorService:
             image_path: Path to the image
             query: Object query (what was being detected)
             bboxes: List of bounding boxes to validate
-            method: Validation method - "coordinate", "visual", or "hybrid"
+            method: Validation method - "coordinate", "visual", "hybrid" (both
+                    checks concurrently) or "hybrid_fast" (visual check only
+                    once the coordinate check approves)
+            image: The image already loaded by the caller; loaded from
+                   image_path (once, shared by hybrid's two checks) if omitted
             
         Returns:
             dict with status, feedback, and issues
         """
+        cache_key = self._cache_key(image_path, query, bboxes, method) if self.cache is not None else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.debug("Cached %s verdict for %s", method, os.path.basename(image_path))
+                return cached
+        
+        result = self._run_validation(image_path, query, bboxes, method, image)
+        # Errors are transient; only store real verdicts
+        if cache_key is not None and result.get("status") in ("APPROVED", "NEEDS_IMPROVEMENT"):
+            self.cache.set(cache_key, result, expire=DEFAULT_TTL)
+        return result
+    
+    def _cache_key(self, image_path: str, query: str, bboxes: list, method: str):
+        """
+        Build the verdict cache key, or None if the image cannot be read.
+        
+        The image is identified by a digest of its bytes and the boxes by a
+        digest of their sorted JSON, so box order does not matter.
+        """
+        try:
+            image_digest = hashlib.blake2b(read_file(image_path), digest_size=16).hexdigest()
+        except OSError:
+            return None
+        canonical = dumps(sorted(([b.get('label', ''), list(b['bbox'])] for b in bboxes), key=repr))
+        boxes_digest = hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{PROMPT_VERSION}::{method}::{query.lower().strip()}::{image_digest}::{boxes_digest}"
+    
+    def _run_validation(self, image_path: str, query: str, bboxes: list, method: str,
+                        image: Image.Image = None) -> dict:
+        """Dispatch to the validator for method (see validate)."""
         if method == "visual":
-            return self._validate_visual(image_path, query, bboxes)
+            return self._validate_visual(image_path, query, bboxes, image)
         elif method == "hybrid":
-            return self._validate_hybrid(image_path, query, bboxes)
+            return self._validate_hybrid(image_path, query, bboxes, image)
+        elif method == "hybrid_fast":
+            return self._validate_hybrid(image_path, query, bboxes, image, short_circuit=True)
         else:  # coordinate (default)
-            return self._validate_coordinate(image_path, query, bboxes)
+            return self._validate_coordinate(image_path, query, bboxes, image)
     
-    def _validate_coordinate(self, image_path: str, query: str, bboxes: list) -> dict:
+    def _validate_coordinate(self, image_path: str, query: str, bboxes: list, image: Image.Image = None) -> dict:
         """
         Coordinate-based validation (original method).
         Validator receives image + bbox coordinates as JSON.
         """
         try:
-            image = Image.open(image_path)
+            if image is None:
+                image = prepare_for_api(image_path)
             
-            prompt = (
-                f"Validate these bounding box annotations for '{query}':\n"
-                f"Number of boxes: {len(bboxes)}\n"
-                f"Bounding boxes: {json.dumps(bboxes)}\n\n"
-                "Check for:\n"
-                "1. Completeness: Are all objects detected?\n"
-                "2. Accuracy: Are boxes properly fitted?\n"
-                "3. Correctness: No false positives?\n\n"
-                "Return JSON: {\"status\": \"APPROVED\" or \"NEEDS_IMPROVEMENT\", \"feedback\": \"...\", \"issues\": [...]}"
-            )
+            prompt = _COORDINATE_PROMPT.format(query=query, count=len(bboxes), bboxes_json=_compact_boxes(bboxes))
             
-            response = self.model.generate_content([prompt, image])
+            response = self.model.generate_content([prompt, image], generation_config=_VALIDATION_CONFIG)
             
             if not response or not response.text:
                 return {
@@ -112,53 +352,38 @@ class ValidatorService:
                     "issues": ["Validation failed"]
                 }
                 
-            text = response.text.strip()
-            
-            # Clean up markdown
-            if text.startswith("```json"):
-                text = text.replace("```json", "").replace("```", "")
-            text = text.strip()
-            
             # Parse response
             try:
-                result = json.loads(text)
-                return result
-            except json.JSONDecodeError:
+                return parse_llm_json(response.text)
+            except JSONDecodeError:
                 # Fallback: look for APPROVED or NEEDS_IMPROVEMENT in text
+                text = strip_code_fences(response.text)
                 if "APPROVED" in text.upper():
                     return {"status": "APPROVED", "feedback": "Quality check passed", "issues": []}
                 else:
                     return {"status": "NEEDS_IMPROVEMENT", "feedback": text, "issues": ["Review needed"]}
                     
         except Exception as e:
-            logger.error(f"Validation error: {e}", exc_info=True)
+            logger.error("Validation error: %s", e, exc_info=True)
             return {
                 "status": "ERROR",
                 "feedback": f"Validation failed: {str(e)}",
                 "issues": ["Exception during validation"]
             }
     
-    def _validate_visual(self, image_path: str, query: str, bboxes: list) -> dict:
+    def _validate_visual(self, image_path: str, query: str, bboxes: list, image: Image.Image = None) -> dict:
         """
         Visual validation method.
         Draws boxes on image and validator sees the annotated image.
         """
         try:
             # Draw boxes on image
-            annotated_image = self._draw_boxes_on_image(image_path, bboxes)
+            annotated_image = self._draw_boxes_on_image(image_path, bboxes, image)
             
-            prompt = (
-                f"This image shows bounding box annotations for '{query}'.\n"
-                f"The RED BOXES show the detected objects.\n"
-                f"Number of boxes: {len(bboxes)}\n\n"
-                "Evaluate the annotations:\n"
-                "1. Are all instances of the object detected?\n"
-                "2. Do the boxes properly cover the entire object?\n"
-                "3. Are there any false positives (boxes on wrong objects)?\n\n"
-                "Return JSON: {\"status\": \"APPROVED\" or \"NEEDS_IMPROVEMENT\", \"feedback\": \"...\", \"issues\": [...]}"
-            )
+            prompt = _VISUAL_PROMPT.format(query=query, count=len(bboxes))
             
-            response = self.model.generate_content([prompt, annotated_image])
+            response = self.model.generate_content([prompt, annotated_image],
+                                                   generation_config=_VALIDATION_CONFIG)
             
             if not response or not response.text:
                 return {
@@ -167,36 +392,50 @@ class ValidatorService:
                     "issues": ["Validation failed"]
                 }
             
-            text = response.text.strip()
-            if text.startswith("```json"):
-                text = text.replace("```json", "").replace("```", "").strip()
-            
             try:
-                result = json.loads(text)
-                return result
-            except json.JSONDecodeError:
+                return parse_llm_json(response.text)
+            except JSONDecodeError:
+                text = strip_code_fences(response.text)
                 if "APPROVED" in text.upper():
                     return {"status": "APPROVED", "feedback": "Quality check passed", "issues": []}
                 else:
                     return {"status": "NEEDS_IMPROVEMENT", "feedback": text, "issues": ["Review needed"]}
         
         except Exception as e:
-            logger.error(f"Visual validation error: {e}", exc_info=True)
+            logger.error("Visual validation error: %s", e, exc_info=True)
             return {
                 "status": "ERROR",
                 "feedback": f"Visual validation failed: {str(e)}",
                 "issues": ["Exception during visual validation"]
             }
     
-    def _validate_hybrid(self, image_path: str, query: str, bboxes: list) -> dict:
+    def _validate_hybrid(self, image_path: str, query: str, bboxes: list, image: Image.Image = None,
+                         short_circuit: bool = False) -> dict:
         """
         Hybrid validation method.
         Uses both coordinate and visual validation, combines feedback.
+        Both must approve, so with short_circuit the visual call is skipped
+        when the coordinate check already rejects; otherwise the two model
+        calls run concurrently.
         """
         try:
-            # Run both validations
-            coord_result = self._validate_coordinate(image_path, query, bboxes)
-            visual_result = self._validate_visual(image_path, query, bboxes)
+            if image is None:
+                image = prepare_for_api(image_path)
+            
+            if short_circuit:
+                coord_result = self._validate_coordinate(image_path, query, bboxes, image)
+                if coord_result["status"] != "APPROVED":
+                    return {
+                        "status": "NEEDS_IMPROVEMENT",
+                        "feedback": f"Coordinate check: {coord_result.get('feedback', '')}",
+                        "issues": coord_result.get("issues", [])
+                    }
+                visual_result = self._validate_visual(image_path, query, bboxes, image)
+            else:
+                # Run both validations
+                coord_future = self._executor.submit(self._validate_coordinate, image_path, query, bboxes, image)
+                visual_result = self._validate_visual(image_path, query, bboxes, image)
+                coord_result = coord_future.result()
             
             # Combine results - both must approve for overall approval
             if coord_result["status"] == "APPROVED" and visual_result["status"] == "APPROVED":
@@ -222,7 +461,7 @@ class ValidatorService:
                 }
         
         except Exception as e:
-            logger.error(f"Hybrid validation error: {e}", exc_info=True)
+            logger.error("Hybrid validation error: %s", e, exc_info=True)
             return {
                 "status": "ERROR",
                 "feedback": f"Hybrid validation failed: {str(e)}",
@@ -235,98 +474,192 @@ class AnnotationRefinementLoop:
     Implements iterative refinement loop for annotations.
     """
     
-    def __init__(self, annotator_agent, max_iterations: int = 3, validation_method: str = "coordinate"):
+    def __init__(self, annotator_agent, max_iterations: int = 3, validation_method: str = "coordinate",
+                 speculative: bool = None):
         """
         Initialize refinement loop.
         
         Args:
             annotator_agent: The annotation agent to use
             max_iterations: Maximum number of refinement iterations
-            validation_method: Validation method - "coordinate", "visual", or "hybrid"
+            validation_method: Validation method - "coordinate", "visual", "hybrid" or "hybrid_fast"
+            speculative: Request the next iteration's annotation while the current
+                         one is validated (default: quality_loop.speculative config)
         """
         self.annotator = annotator_agent
         self.validator = ValidatorService()
         self.max_iterations = max_iterations
         self.validation_method = validation_method
+        if speculative is None:
+            speculative = get_config().get('quality_loop.speculative', False)
+        self.speculative = speculative
+        # Parsed boxes keyed on prompt + image phash (None if disabled)
+        self.cache = get_cache("refinement")
+        # Runs speculative annotation requests; threads are only started on first use
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="refinement")
+        
+    def annotate_many_with_refinement(self, image_paths: List[str], query: str, max_concurrent: int = None,
+                                      prefetch: int = 3, max_results: int = None) -> Dict[str, dict]:
+        """
+        Refine several images, decoding upcoming ones while others are with the model.
+        
+        A loader thread decodes images on a small pool (see _prefetch_images)
+        into a bounded queue (at most prefetch waiting) and max_concurrent
+        workers drain it, so file I/O and JPEG decoding overlap with model
+        calls while in-flight requests stay capped. Images are refined in the
+        order they finish decoding.
+        
+        Args:
+            image_paths: Images to annotate
+            query: Object query
+            max_concurrent: Images refined at once (default: annotation.num_workers config)
+            prefetch: Decoded images kept ready ahead of the workers
+            max_results: Stop once this many images are annotated; images not
+                         started yet are skipped
+            
+        Returns:
+            Dict mapping filename to annotation data (as annotate_with_refinement);
+            images that failed are left out
+        """
+        if not image_paths:
+            return {}
+        if max_concurrent is None:
+            max_concurrent = get_config().get('annotation.num_workers', 3)
+        num_workers = max(1, min(max_concurrent, len(image_paths)))
+        decode_workers = max(1, min(4, len(image_paths)))
+        
+        loaded = queue.Queue(maxsize=max(1, prefetch))
+        results = {}
+        results_lock = threading.Lock()
+        target_reached = threading.Event()
+        
+        def load():
+            try:
+                for item in _prefetch_images(image_paths, num_workers=decode_workers):
+                    if target_reached.is_set():
+                        break
+                    loaded.put(item)
+            finally:
+                # One stop marker per worker, even if loading failed midway
+                for _ in range(num_workers):
+                    loaded.put(None)
+        
+        def refine():
+            while (item := loaded.get()) is not None:
+                path, record = item
+                if record is None:
+                    # Read/decode failure, already logged by the loader
+                    continue
+                if target_reached.is_set():
+                    # Keep draining so the loader never blocks on a full queue
+                    record.close()
+                    continue
+                try:
+                    annotation = self.annotate_with_refinement(path, query, record=record)
+                except Exception as e:
+                    logger.error("Refinement failed for %s: %s", path, e)
+                    continue
+                if annotation:
+                    with results_lock:
+                        results[os.path.basename(path)] = annotation
+                        if max_results is not None and len(results) >= max_results:
+                            target_reached.set()
+        
+        threads = [threading.Thread(target=load, name="refinement-prefetch", daemon=True)]
+        threads += [threading.Thread(target=refine, name=f"refinement-{i}", daemon=True) for i in range(num_workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
         
-    def annotate_with_refinement(self, image_path: str, query: str) -> dict:
+        logger.info("🎯 Refined %d/%d images", len(results), len(image_paths))
+        return results
+    
+    def annotate_with_refinement(self, image_path: str, query: str, record: ImageRecord = None) -> dict:
         """
         Annotate image with iterative quality refinement.
         
+        With speculative enabled, the next iteration's annotation request is
+        sent (with generic refinement feedback) alongside each validation.
+        It replaces the feedback-driven request if the verdict asks for
+        improvements, and is cancelled or ignored once annotations are approved.
+        
         Args:
             image_path: Path to image file
             query: Object query
+            record: The image already decoded by the caller (closed when done);
+                    loaded from image_path if omitted
             
         Returns:
             dict with annotation data and refinement stats
         """
         filename = os.path.basename(image_path)
-        logger.info(f"🔄 Starting refinement loop for {filename}")
+        logger.info("🔄 Starting refinement loop for %s", filename)
+        
+        # Decode once; every iteration and validator call reuses it
+        if record is None:
+            record = _load_record(image_path)
+        if record is None:
+            # Read/decode failure, already logged by _load_record or safe_open
+            return None
+        image, width, height = record.pil, record.width, record.height
+        
+        # Cached model answers are keyed on the file's bytes, so only an
+        # identical file (not a resized or recompressed copy) reuses them
+        image_digest = None
+        if self.cache is not None:
+            try:
+                image_digest = hashlib.blake2b(read_file(image_path), digest_size=16).hexdigest()
+            except OSError:
+                pass
         
         iteration = 0
         best_annotation = None
+        best_status = None
         refinement_history = []
+        previous_boxes = None
+        # (box signature, verdict) for this image's recent validations
+        verdicts = deque(maxlen=VERDICT_WINDOW)
+        # Prompts that depend only on the query are built once per image
+        base_prompt = _ANNOTATE_PROMPT.format(query=query)
+        speculative_prompt = _REFINE_PROMPT.format(query=query, feedback=_SPECULATIVE_FEEDBACK)
+        # Next iteration's annotation, requested before the current verdict
+        speculative_future = None
         
         while iteration < self.max_iterations:
             iteration += 1
-            logger.debug(f"   Iteration {iteration}/{self.max_iterations}")
+            logger.debug("   Iteration %d/%d", iteration, self.max_iterations)
             
             # Get annotation
             try:
-                image = Image.open(image_path)
-                width, height = image.size
-                
-                # Build prompt (include feedback from previous iteration if available)
-                if refinement_history:
-                    last_feedback = refinement_history[-1].get("feedback", "")
-                    if not last_feedback:
-                        # Fallback if no feedback available (e.g. after error)
-                        prompt = (
-                            f"Annotate ALL instances of '{query}' in this image. "
-                            "Output ONLY valid JSON: [{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}]. "
-                            "Use normalized coordinates (0-1000 range)."
-                        )
-                    else:
-                        prompt = (
-                            f"Annotate ALL instances of '{query}' in this image. "
-                            f"Previous feedback: {last_feedback} "
-                            "Improve the annotations based on this feedback. "
-                            "Output ONLY valid JSON: [{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}]. "
-                            "Use normalized coordinates (0-1000 range)."
-                        )
+                if speculative_future is not None:
+                    # Already requested while the previous iteration was validated
+                    future, speculative_future = speculative_future, None
+                    bboxes = future.result()
                 else:
-                    prompt = (
-                        f"Annotate ALL instances of '{query}' in this image. "
-                        "Output ONLY valid JSON: [{\"label\": \"object_name\", \"bbox\": [ymin, xmin, ymax, xmax]}]. "
-                        "Use normalized coordinates (0-1000 range)."
-                    )
-                
-                response = self.annotator.model.generate_content([prompt, image])
-                
-                if not response or not response.text:
-                    logger.warning(f"No response in iteration {iteration}")
-                    continue
+                    # Build prompt (include feedback from previous iteration if available;
+                    # none after an error)
+                    last_feedback = refinement_history[-1].get("feedback", "") if refinement_history else ""
+                    if last_feedback:
+                        prompt = _REFINE_PROMPT.format(query=query, feedback=last_feedback)
+                    else:
+                        prompt = base_prompt
                     
-                text = response.text.strip()
-                if text.startswith("```json"):
-                    text = text.replace("```json", "").replace("```", "")
-                text = text.strip()
-                
-                # Parse JSON
-                try:
-                    bboxes = json.loads(text)
-                except json.JSONDecodeError:
-                    # Try to fix
-                    import re
-                    fixed_text = text.replace("'", '"')
-                    fixed_text = re.sub(r',\s*}', '}', fixed_text)
-                    fixed_text = re.sub(r',\s*]', ']', fixed_text)
-                    bboxes = json.loads(fixed_text)
+                    bboxes = self._generate_bboxes(prompt, image, image_path, image_digest)
+                if bboxes is None:
+                    logger.warning("No response in iteration %d", iteration)
+                    continue
                 
                 # Validate format
                 if not isinstance(bboxes, list) or not bboxes:
-                    logger.warning(f"Invalid bbox format in iteration {iteration}")
+                    logger.warning("Invalid bbox format in iteration %d", iteration)
                     continue
+                
+                # (Nearly) the same boxes as last time: feedback is not changing the answer
+                if _boxes_converged(previous_boxes, bboxes):
+                    logger.info("   ↺ Iteration %d: boxes unchanged, converged", iteration)
+                    break
+                previous_boxes = bboxes
                     
                 # Store this annotation
                 current_annotation = {
@@ -335,8 +668,20 @@ class AnnotationRefinementLoop:
                     "height": height
                 }
                 
-                # Validate quality
-                validation = self.validator.validate(image_path, query, bboxes, method=self.validation_method)
+                if self.speculative and iteration < self.max_iterations:
+                    speculative_future = self._executor.submit(self._generate_bboxes, speculative_prompt,
+                                                               image, image_path, image_digest)
+                
+                # Validate quality, unless a near-identical box set was just judged
+                signature = _box_signature(bboxes)
+                validation = _find_verdict(verdicts, signature)
+                if validation is None:
+                    validation = self.validator.validate(image_path, query, bboxes,
+                                                         method=self.validation_method, image=image)
+                    if validation["status"] != "ERROR":
+                        verdicts.append((signature, validation))
+                else:
+                    logger.debug("   Reusing verdict for near-identical boxes in iteration %d", iteration)
                 
                 refinement_history.append({
                     "iteration": iteration,
@@ -346,33 +691,75 @@ class AnnotationRefinementLoop:
                     "issues": validation.get("issues", [])
                 })
                 
-                logger.info(f"   ✓ Iteration {iteration}: {len(bboxes)} boxes, Status: {validation['status']}")
+                logger.info("   ✓ Iteration %d: %d boxes, Status: %s", iteration, len(bboxes), validation['status'])
                 
-                # Always update to the latest annotation (don't accumulate)
-                # This ensures we keep only the most recent iteration's result
-                best_annotation = current_annotation
+                # Keep the best-rated annotation, preferring later iterations on ties
+                rank = _STATUS_RANK.get(validation["status"], 0)
+                if best_annotation is None or rank >= _STATUS_RANK.get(best_status, 0):
+                    best_annotation, best_status = current_annotation, validation["status"]
                     
                 # If approved, we're done
                 if validation["status"] == "APPROVED":
-                    logger.info(f"✅ Annotation approved after {iteration} iteration(s)")
+                    logger.info("✅ Annotation approved after %d iteration(s)", iteration)
                     break
                     
             except Exception as e:
-                logger.error(f"Error in iteration {iteration}: {e}", exc_info=True)
+                logger.error("Error in iteration %d: %s", iteration, e, exc_info=True)
                 refinement_history.append({
                     "iteration": iteration,
                     "error": str(e)
                 })
         
+        if speculative_future is not None and not speculative_future.cancel():
+            # Still running against the image; release it when the request ends
+            speculative_future.add_done_callback(lambda _: record.close())
+        else:
+            record.close()
+        
         # Return best annotation with refinement stats
         if best_annotation:
             best_annotation["refinement_stats"] = {
                 "iterations": iteration,
                 "history": refinement_history,
-                "final_status": refinement_history[-1]["validation_status"] if refinement_history else "UNKNOWN"
+                "final_status": best_status or "UNKNOWN"
             }
-            logger.info(f"🎯 Refinement complete: {len(best_annotation['bboxes'])} boxes after {iteration} iterations")
+            logger.info("🎯 Refinement complete: %d boxes after %d iterations", len(best_annotation['bboxes']), iteration)
             return best_annotation
         else:
-            logger.error(f"❌ Failed to generate valid annotation for {filename}")
+            logger.error("❌ Failed to generate valid annotation for %s", filename)
             return None
+
+    def _generate_bboxes(self, prompt: str, image: Image.Image, image_path: str, image_digest: Optional[str]):
+        """
+        Ask the annotator for boxes, reusing a previous answer to the same prompt.
+        
+        Only well-formed box lists are cached, so a retry after a bad reply
+        still goes back to the model.
+        
+        Args:
+            prompt: Annotation or refinement prompt
+            image: Prepared image sent with the prompt
+            image_path: Path to the image file (for logging)
+            image_digest: Digest of the file's bytes; None skips the cache
+            
+        Returns:
+            Parsed JSON from the response, or None if the model returned nothing
+        """
+        cache_key = None
+        if self.cache is not None and image_digest is not None:
+            prompt_hash = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).hexdigest()
+            cache_key = f"{prompt_hash}::{image_digest}"
+            cached_bboxes = self.cache.get(cache_key)
+            if cached_bboxes is not None:
+                logger.debug("   Reusing cached response for %s", os.path.basename(image_path))
+                return cached_bboxes
+        
+        response = self.annotator.model.generate_content([prompt, image], generation_config=_ANNOTATION_CONFIG)
+        if not response or not response.text:
+            return None
+        
+        # Schema-checked parse first; quote/trailing-comma repair only if needed
+        bboxes = decode_boxes(response.text) or parse_llm_json(response.text)
+        if cache_key is not None and isinstance(bboxes, list) and bboxes:
+            self.cache.set(cache_key, bboxes, expire=DEFAULT_TTL)
+        return bboxes
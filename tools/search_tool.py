@@ -1,5 +1,8 @@
 import os
 from googleapiclient.discovery import build
+from utils.logger import get_logger
+
+logger = get_logger("search_tool")
 
 def google_search_images(query: str, num_images: int = 5, start_index: int = 1) -> dict:
     """
@@ -15,9 +18,6 @@ def google_search_images(query: str, num_images: int = 5, start_index: int = 1)
         Success: {"status": "success", "data": [...], "count": 5, "next_index": 6}
         Error: {"status": "error", "error_message": "...", "data": [], "count": 0}
     """
-    import logging
-    logger = logging.getLogger("foundry.search_tool")
-    
     num_images = int(num_images)
     start_index = int(start_index)
     logger.info(f"Searching for {num_images} images of '{query}' starting at {start_index}")
@@ -0,0 +1,29 @@
+"""
+Helpers for driving asyncio coroutines from synchronous code.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_sync(coro):
+    """
+    Run a coroutine to completion and return its result.
+
+    Uses asyncio.run when no event loop is running in the current thread.
+    When called from inside a running loop (e.g. an ADK tool invoked by the
+    runner), the coroutine is executed on a fresh loop in a helper thread
+    so the caller's loop is never re-entered.
+
+    Args:
+        coro: Coroutine object to execute
+
+    Returns:
+        The coroutine's return value
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
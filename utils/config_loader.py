@@ -40,7 +40,8 @@ class Config:
             'quality_loop': {
                 'enabled': False,
                 'max_iterations': 2,
-                'validation_method': 'coordinate'
+                'validation_method': 'coordinate',
+                'speculative': False
             },
             'annotation': {
                 'num_workers': 3
@@ -49,6 +50,21 @@ class Config:
                 'enabled': True,
                 'show_summary': False
             },
+            'cache': {
+                'enabled': True,
+                'dir': 'data/.cache',
+                'llm_mode': 'on'
+            },
+            'gemini': {
+                'transport': 'sdk',
+                'max_connections': 64,
+                'cache_instructions': False,
+                'cache_ttl': 3600
+            },
+            'adk': {
+                'max_loop_iterations': 20,
+                'parallel_branches': 1
+            },
             'advanced': {
                 'max_pipeline_loops': 5,
                 'log_level': 'INFO'
@@ -125,6 +141,11 @@ class Config:
         if hasattr(args, 'show_metrics') and args.show_metrics:
             self.config['metrics']['show_summary'] = True
             logger.debug("CLI override: show_metrics enabled")
+        
+        # Cache settings
+        if hasattr(args, 'no_cache') and args.no_cache:
+            self.config['cache']['enabled'] = False
+            logger.debug("CLI override: cache disabled")
     
     def get(self, key_path: str, default=None):
         """
@@ -185,6 +206,13 @@ class Config:
         logger.info(f"  Enabled: {'✅ Yes' if self.get('metrics.enabled') else '❌ No'}")
         logger.info(f"  Show Summary: {'✅ Yes' if self.get('metrics.show_summary') else '❌ No'}")
         
+        # Cache
+        logger.info("\nCache:")
+        logger.info(f"  Enabled: {'✅ Yes' if self.get('cache.enabled') else '❌ No'}")
+        if self.get('cache.enabled'):
+            logger.info(f"  Directory: {self.get('cache.dir')}")
+            logger.info(f"  LLM Responses: {self.get('cache.llm_mode', 'on')}")
+        
         logger.info("=" * 60)
 
 
@@ -0,0 +1,113 @@
+"""
+Persistent key/value cache for model results, backed by SQLite.
+"""
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+from utils.config_loader import get_config
+from utils.json_utils import loads, dumps
+from utils.logger import get_logger
+
+logger = get_logger("disk_cache")
+
+# Default time-to-live for cached model verdicts (30 days)
+DEFAULT_TTL = 30 * 86400
+
+
+class DiskCache:
+    """
+    Small persistent cache for JSON-serializable values.
+
+    Entries live in a single SQLite file and may carry an expiry time.
+    A single connection is shared behind a lock, so instances are safe
+    to use from worker threads.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) a cache file.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing/expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None:
+            return default
+
+        value, expires_at = row
+        if expires_at is not None and expires_at < time.time():
+            self.delete(key)
+            return default
+        return loads(value)
+
+    def set(self, key: str, value: Any, expire: Optional[float] = None):
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            expire: Seconds until the entry expires (None = never)
+        """
+        expires_at = time.time() + expire if expire else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, dumps(value), expires_at)
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        """Remove an entry if present."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+
+# Open caches, one per namespace
+_caches: Dict[str, DiskCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace: str) -> Optional[DiskCache]:
+    """
+    Get the shared cache for a namespace.
+
+    Args:
+        namespace: Cache name (e.g. "curator", "annotator")
+
+    Returns:
+        DiskCache instance, or None if caching is disabled in config
+        (cache.enabled: false or the --no-cache CLI flag).
+    """
+    config = get_config()
+    if not config.get('cache.enabled', True):
+        return None
+
+    with _caches_lock:
+        if namespace not in _caches:
+            cache_dir = config.get('cache.dir', 'data/.cache')
+            _caches[namespace] = DiskCache(os.path.join(cache_dir, f"{namespace}.db"))
+            logger.debug(f"Opened '{namespace}' cache in {cache_dir}")
+        return _caches[namespace]
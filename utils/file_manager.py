@@ -1,8 +1,13 @@
 import os
+import errno
+import shutil
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from PIL import Image
 from io import BytesIO
 import hashlib
+from functools import lru_cache
 
 def create_directories(base_path):
     """Creates the necessary directories for the project."""
@@ -10,13 +15,28 @@ def create_directories(base_path):
     for d in dirs:
         os.makedirs(os.path.join(base_path, d), exist_ok=True)
 
+# Shared across download threads so connections are kept alive and reused
+_session = None
+_session_lock = threading.Lock()
+
+def _http_session():
+    """Returns the process-wide pooled requests.Session."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
 def save_image(url, save_folder):
     """Downloads and saves an image from a URL. Returns the file path or None."""
     try:
         # Ensure directory exists
         os.makedirs(save_folder, exist_ok=True)
         
-        response = requests.get(url, timeout=10)
+        response = _http_session().get(url, timeout=10)
         response.raise_for_status()
         
         # Verify it's an image
@@ -37,10 +57,41 @@ def save_image(url, save_folder):
         # print(f"Failed to download {url}: {e}")
         return None
 
+def link_or_copy(src, dest):
+    """
+    Places src at dest as a hardlink, copying only when linking is impossible.
+
+    Hardlinks avoid rewriting the image bytes when both folders are on the
+    same filesystem. Falls back to a copy across devices or on filesystems
+    without hardlink support; an existing dest is left as is.
+    """
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        pass
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK):
+            raise
+        shutil.copy(src, dest)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
 def list_images(folder_path):
-    """Returns a list of image paths in a folder."""
-    if not os.path.exists(folder_path):
+    """
+    Returns a list of image paths in a folder.
+    
+    Listings are cached per folder and modification time, so repeated calls
+    on an unchanged folder skip the directory walk.
+    """
+    try:
+        mtime_ns = os.stat(folder_path).st_mtime_ns
+    except OSError:
         return []
-    valid_exts = ['.jpg', '.jpeg', '.png']
-    return [os.path.join(folder_path, f) for f in os.listdir(folder_path) 
-            if os.path.splitext(f)[1].lower() in valid_exts]
+    return list(_scan_images(os.path.abspath(folder_path), folder_path, mtime_ns))
+
+@lru_cache(maxsize=8)
+def _scan_images(abs_path, folder_path, mtime_ns):
+    # scandir reports the entry type without a stat() per file
+    with os.scandir(abs_path) as entries:
+        return tuple(os.path.join(folder_path, entry.name) for entry in entries
+                     if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file())
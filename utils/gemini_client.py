@@ -1,28 +1,147 @@
 import os
+import time
+import hashlib
+import datetime
+import threading
 import google.generativeai as genai
+from utils.config_loader import get_config
 from utils.logger import get_logger
 
 logger = get_logger("gemini_client")
 
+# Model handles shared across services, keyed on (transport, model, instruction hash)
+_MODEL_CACHE = {}
+_model_cache_lock = threading.Lock()
+
+# Seconds before cached content expires that it is re-created
+_CACHE_REFRESH_MARGIN = 60
+
 def get_gemini_model(model_name: str = "gemini-2.5-flash", system_instruction: str = None):
     """
     Get a configured Gemini GenerativeModel instance.
     
+    With gemini.transport set to "rest" in config, returns a
+    RestGenerativeModel that sends requests over a shared pooled HTTP
+    client instead of the SDK transport; it supports generate_content only.
+    
+    Models are only used through stateless generate_content calls, so one
+    handle per (model, system instruction) is created and reused by every
+    service instance that asks for it. With gemini.cache_instructions, the
+    handle is a CachedInstructionModel, which renews its cached content
+    before cache_ttl runs out.
+    
     Args:
         model_name: Name of the model to use (default: gemini-2.5-flash)
         system_instruction: Optional system instruction for the model
         
     Returns:
-        genai.GenerativeModel: Configured model instance
+        genai.GenerativeModel (or RestGenerativeModel / CachedInstructionModel): Configured model instance
     """
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         logger.error("GEMINI_API_KEY not found in environment variables")
         raise ValueError("GEMINI_API_KEY not found")
+    
+    config = get_config()
+    transport = config.get('gemini.transport', 'sdk')
+    instruction_hash = hashlib.md5((system_instruction or "").encode()).hexdigest()
+    key = (transport, api_key, model_name, instruction_hash)
+    
+    with _model_cache_lock:
+        model = _MODEL_CACHE.get(key)
+        if model is None:
+            model = _create_model(transport, api_key, model_name, system_instruction, config)
+            _MODEL_CACHE[key] = model
+        return model
+
+def _create_model(transport, api_key, model_name, system_instruction, config):
+    """Build a new model handle for the configured transport."""
+    if transport == 'rest':
+        from utils.gemini_transport import RestGenerativeModel
+        return RestGenerativeModel(
+            model_name=model_name,
+            api_key=api_key,
+            system_instruction=system_instruction,
+            max_connections=config.get('gemini.max_connections', 64)
+        )
         
     genai.configure(api_key=api_key)
     
+    if system_instruction and config.get('gemini.cache_instructions', False):
+        ttl = config.get('gemini.cache_ttl', 3600)
+        model = _create_cached_model(model_name, system_instruction, ttl)
+        if model is not None:
+            return CachedInstructionModel(model, model_name, system_instruction, ttl)
+    
     return genai.GenerativeModel(
         model_name=model_name,
         system_instruction=system_instruction
     )
+
+def _create_cached_model(model_name, system_instruction, ttl):
+    """
+    Build a model whose system instruction is stored server-side.
+    
+    Requests then reference the cached content instead of re-sending the
+    instruction. The API only caches content above a minimum token count,
+    so short instructions fail here and the caller falls back to a plain
+    model.
+    
+    Returns:
+        genai.GenerativeModel bound to the cached content, or None on failure
+    """
+    try:
+        from google.generativeai import caching
+        
+        cached = caching.CachedContent.create(
+            model=model_name if model_name.startswith("models/") else f"models/{model_name}",
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl)
+        )
+        logger.info(f"Cached system instruction for {model_name} ({cached.name})")
+        return genai.GenerativeModel.from_cached_content(cached_content=cached)
+    except Exception as e:
+        logger.debug(f"System instruction caching unavailable, sending it per request: {e}")
+        return None
+
+class CachedInstructionModel:
+    """
+    Model handle bound to server-side cached content that outlives the cache.
+    
+    The cached content expires after its TTL, and requests referencing it
+    fail from then on. Services keep their model handle for the life of the
+    process, so this handle re-creates the cached content (and the model
+    bound to it) shortly before the TTL runs out. If re-caching fails, it
+    falls back to sending the instruction with every request.
+    Supports generate_content only.
+    """
+    
+    def __init__(self, model, model_name: str, system_instruction: str, ttl: int):
+        self._model = model
+        self._model_name = model_name
+        self._system_instruction = system_instruction
+        self._ttl = ttl
+        self._expires_at = self._deadline()
+        self._lock = threading.Lock()
+    
+    def _deadline(self) -> float:
+        return time.monotonic() + self._ttl - min(_CACHE_REFRESH_MARGIN, self._ttl / 2)
+    
+    def _current(self):
+        """Return the bound model, re-creating it first if its content is about to expire."""
+        with self._lock:
+            if self._expires_at is not None and time.monotonic() >= self._expires_at:
+                model = _create_cached_model(self._model_name, self._system_instruction, self._ttl)
+                if model is not None:
+                    self._expires_at = self._deadline()
+                else:
+                    model = genai.GenerativeModel(
+                        model_name=self._model_name,
+                        system_instruction=self._system_instruction
+                    )
+                    self._expires_at = None
+                self._model = model
+            return self._model
+    
+    def generate_content(self, *args, **kwargs):
+        return self._current().generate_content(*args, **kwargs)
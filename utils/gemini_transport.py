@@ -0,0 +1,141 @@
+"""
+Pooled HTTP transport for Gemini generateContent calls.
+
+An alternative to the google-generativeai SDK for high-concurrency runs:
+every call goes through one process-wide httpx.Client, so worker threads
+reuse keep-alive (and, when the h2 package is installed, HTTP/2)
+connections instead of paying a TLS handshake per request.
+"""
+import io
+import base64
+import threading
+from typing import Any, Dict, Optional
+import httpx
+from PIL import Image
+from utils.logger import get_logger
+
+logger = get_logger("gemini_transport")
+
+API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+
+# Process-wide client, created on first use
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def shared_client(max_connections: int = 64) -> httpx.Client:
+    """
+    Get the process-wide pooled HTTP client.
+
+    The client is synchronous and thread-safe, so it can be shared by the
+    annotator's thread pool and by asyncio.to_thread calls from any event
+    loop (an AsyncClient would be tied to the loop that created it).
+
+    Args:
+        max_connections: Connection pool size (only used on first call)
+
+    Returns:
+        httpx.Client
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            try:
+                import h2  # noqa: F401  (enables HTTP/2 in httpx)
+                http2 = True
+            except ImportError:
+                http2 = False
+
+            _client = httpx.Client(
+                http2=http2,
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_connections)
+            )
+            logger.debug(f"Created shared Gemini HTTP client (http2={http2}, pool={max_connections})")
+        return _client
+
+
+class RestResponse:
+    """Minimal stand-in for the SDK's GenerateContentResponse."""
+
+    def __init__(self, payload: Dict):
+        self.payload = payload
+        self.candidates = payload.get("candidates", [])
+
+    @property
+    def text(self) -> str:
+        """Concatenated text of the first candidate (ValueError if blocked/empty)."""
+        if not self.candidates:
+            feedback = self.payload.get("promptFeedback", {})
+            raise ValueError(f"Response has no candidates: {feedback}")
+        parts = self.candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+
+class RestGenerativeModel:
+    """
+    Drop-in replacement for genai.GenerativeModel.generate_content over REST.
+
+    Accepts the same part types the services send: strings and PIL images.
+    """
+
+    def __init__(self, model_name: str, api_key: str, system_instruction: str = None,
+                 max_connections: int = 64):
+        """
+        Args:
+            model_name: Gemini model name (e.g. gemini-2.5-flash)
+            api_key: Gemini API key
+            system_instruction: Optional system instruction
+            max_connections: Connection pool size for the shared client
+        """
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self._api_key = api_key
+        self._url = f"{API_BASE}/models/{model_name}:generateContent"
+        self._http = shared_client(max_connections)
+
+    def generate_content(self, contents: Any, generation_config: Dict = None, **kwargs) -> RestResponse:
+        """
+        Generate content from a prompt and images.
+
+        Args:
+            contents: A string, PIL image, or list of them
+            generation_config: Optional generationConfig dict (camelCase or snake_case keys)
+
+        Returns:
+            RestResponse exposing .text and .candidates
+
+        Raises:
+            httpx.HTTPStatusError: On a non-2xx response
+        """
+        if not isinstance(contents, (list, tuple)):
+            contents = [contents]
+
+        body = {"contents": [{"role": "user", "parts": [_to_part(c) for c in contents]}]}
+        if self.system_instruction:
+            body["systemInstruction"] = {"parts": [{"text": self.system_instruction}]}
+        if generation_config:
+            body["generationConfig"] = {_camel(k): v for k, v in dict(generation_config).items()}
+
+        response = self._http.post(self._url, json=body, headers={"x-goog-api-key": self._api_key})
+        response.raise_for_status()
+        return RestResponse(response.json())
+
+
+def _to_part(content: Any) -> Dict:
+    """Convert a string or PIL image into a REST content part."""
+    if isinstance(content, str):
+        return {"text": content}
+    if isinstance(content, Image.Image):
+        buffer = io.BytesIO()
+        image = content if content.mode == "RGB" else content.convert("RGB")
+        image.save(buffer, format="JPEG", quality=90)
+        return {"inline_data": {"mime_type": "image/jpeg",
+                                "data": base64.b64encode(buffer.getvalue()).decode("ascii")}}
+    raise TypeError(f"Unsupported content part: {type(content).__name__}")
+
+
+def _camel(key: str) -> str:
+    head, *rest = key.split("_")
+    return head + "".join(word.title() for word in rest)
@@ -0,0 +1,119 @@
+"""
+Near-duplicate lookup for perceptual image hashes.
+"""
+
+
+def hash_to_int(image_hash) -> int:
+    """Pack an imagehash.ImageHash (any size) into a Python int."""
+    return int(str(image_hash), 16)
+
+
+def hamming(a: int, b: int) -> int:
+    """Hamming distance between two packed hashes (a single popcount)."""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree for near-neighbour queries under a metric.
+
+    Queries prune whole subtrees using the triangle inequality, so finding
+    hashes within a small Hamming distance costs roughly O(log n) distance
+    computations instead of a scan over every hash seen so far. Items are
+    also kept in a set, so exact repeats (common with CDN-mirrored search
+    results) are answered with one hash lookup before the tree is walked.
+    """
+
+    def __init__(self, distance_func=hamming):
+        """
+        Initialize an empty tree.
+
+        Args:
+            distance_func: Metric between two items (default: Hamming distance
+                           between hashes packed with hash_to_int)
+        """
+        self.distance_func = distance_func
+        self._root = None
+        self._size = 0
+        self._items = set()
+
+    def add(self, item):
+        """Add an item to the tree (exact repeats are stored once)."""
+        if item in self._items:
+            return
+        self._items.add(item)
+        self._size += 1
+        if self._root is None:
+            self._root = (item, {})
+            return
+
+        node = self._root
+        while True:
+            parent, children = node
+            distance = self.distance_func(item, parent)
+            node = children.get(distance)
+            if node is None:
+                children[distance] = (item, {})
+                return
+
+    def find(self, item, n: int) -> list:
+        """
+        Find all items within distance n of item.
+
+        Args:
+            item: Item to search around
+            n: Maximum distance (inclusive)
+
+        Returns:
+            List of (distance, item) tuples sorted by distance
+        """
+        if self._root is None:
+            return []
+
+        found = []
+        candidates = [self._root]
+        while candidates:
+            candidate, children = candidates.pop()
+            distance = self.distance_func(candidate, item)
+            if distance <= n:
+                found.append((distance, candidate))
+
+            # Only subtrees in [distance - n, distance + n] can hold matches
+            lower, upper = distance - n, distance + n
+            candidates.extend(child for d, child in children.items() if lower <= d <= upper)
+
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+    def has_near(self, item, n: int) -> bool:
+        """
+        Check whether any item lies within distance n of item.
+
+        Cheaper than find() for a yes/no answer: exact matches hit the set
+        without touching the tree, and the walk stops at the first match.
+
+        Args:
+            item: Item to search around
+            n: Maximum distance (inclusive)
+        """
+        if item in self._items:
+            return True
+        if self._root is None:
+            return False
+
+        candidates = [self._root]
+        while candidates:
+            candidate, children = candidates.pop()
+            distance = self.distance_func(candidate, item)
+            if distance <= n:
+                return True
+
+            lower, upper = distance - n, distance + n
+            candidates.extend(child for d, child in children.items() if lower <= d <= upper)
+        return False
+
+    def __contains__(self, item) -> bool:
+        return item in self._items
+
+    def __len__(self) -> int:
+        return self._size
@@ -0,0 +1,244 @@
+"""
+Image preparation helpers for Gemini API calls.
+"""
+import io
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional
+import numpy as np
+from PIL import Image, ImageFile, UnidentifiedImageError
+from utils.logger import get_logger
+
+logger = get_logger("image_prep")
+
+# Scraped files are often cut short; decode what is there instead of failing
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+# Formats the pipeline accepts; skips probing every other PIL plugin on open
+IMAGE_FORMATS = ("JPEG", "PNG", "WEBP")
+
+# Longest edge (in pixels) of images uploaded to the model
+MAX_API_EDGE = 1024
+
+# Decode size requested for hashing; phash itself works on a 32x32 thumbnail
+PHASH_DECODE_SIZE = (256, 256)
+PHASH_SIZE = 32
+
+# Rows 0-7 of the (unnormalized) DCT-II basis over 32 samples; C @ X @ C.T is
+# the low-frequency 8x8 corner of the 2-D DCT of a 32x32 block
+_DCT_LOW = 2 * np.cos(np.pi * np.arange(8)[:, None] * (2 * np.arange(PHASH_SIZE) + 1) / (2 * PHASH_SIZE))
+
+
+def read_file(img_path: str) -> bytes:
+    """
+    Read a whole file in one call, hinting sequential access to the kernel.
+
+    Every image is read once, front to back; POSIX_FADV_SEQUENTIAL widens
+    readahead for that pattern. The hint is skipped where unsupported.
+
+    Args:
+        img_path: Path to the file
+
+    Returns:
+        File contents
+    """
+    fd = os.open(img_path, os.O_RDONLY)
+    try:
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            except OSError:
+                pass
+        size = os.fstat(fd).st_size
+        chunks = []
+        while size > 0:
+            chunk = os.read(fd, size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+    finally:
+        os.close(fd)
+
+
+def prefetch_files(paths: Iterable[str]):
+    """
+    Ask the kernel to start reading files into the page cache.
+
+    POSIX_FADV_WILLNEED returns immediately and the reads happen in the
+    background, so disk I/O for the next images overlaps with model
+    requests for the current ones. A no-op where unsupported; missing
+    files are ignored.
+
+    Args:
+        paths: Files that will be read soon
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+def safe_open(img_path: str) -> Optional[Image.Image]:
+    """
+    Open an image restricted to IMAGE_FORMATS.
+
+    The file is read into memory with a single read_file() call rather
+    than the many small reads PIL issues while decoding from disk.
+
+    Args:
+        img_path: Path to the image file
+
+    Returns:
+        PIL Image backed by the file's bytes, or None (with a one-line
+        warning) if the file is not a readable JPEG/PNG/WEBP image
+    """
+    try:
+        return Image.open(io.BytesIO(read_file(img_path)), formats=IMAGE_FORMATS)
+    except UnidentifiedImageError:
+        logger.warning("Skipping unreadable image: %s", os.path.basename(img_path))
+        return None
+
+
+def prepare_for_api(img_path: str, max_edge: int = MAX_API_EDGE) -> Image.Image:
+    """
+    Load an image ready to send to the model.
+
+    JPEGs are draft-decoded no smaller than max_edge, and images still
+    larger than max_edge on their longest side are downscaled with
+    Lanczos resampling, which keeps the content the model needs while
+    cutting upload size for large scraped photos. Bounding boxes are
+    normalized (0-1000), so annotations are unaffected by the resize.
+
+    Results are cached per (path, mtime), so retries and later stages in
+    the same run reuse the prepared image instead of decoding it again.
+
+    Args:
+        img_path: Path to the image file
+        max_edge: Maximum width/height of the returned image
+
+    Returns:
+        RGB PIL Image (callers must not modify it in place)
+    """
+    return _prepare_cached(img_path, os.stat(img_path).st_mtime_ns, max_edge)
+
+
+@lru_cache(maxsize=64)
+def _prepare_cached(img_path: str, mtime_ns: int, max_edge: int) -> Image.Image:
+    with Image.open(img_path, formats=IMAGE_FORMATS) as raw:
+        # JPEGs decode straight at 1/2-1/8 scale when that still covers max_edge
+        raw.draft("RGB", (max_edge, max_edge))
+        # convert() decodes and returns a copy detached from the file handle
+        image = raw.convert("RGB")
+
+    if max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    return image
+
+
+def phash64(image: Image.Image) -> int:
+    """
+    64-bit perceptual hash of an image, packed into an int.
+
+    Produces the same bits as int(str(imagehash.phash(image)), 16): a 2-D
+    DCT of the 32x32 grayscale thumbnail, with the top-left 8x8 block
+    thresholded at its median. Only that block is computed (two small
+    matrix products, no scipy import), and the bits are packed straight
+    from the numpy array instead of going through ImageHash's hex string.
+
+    Args:
+        image: PIL Image (any mode)
+
+    Returns:
+        Hash as a non-negative int (compare with utils.hash_index.hamming)
+    """
+    thumb = image.convert("L").resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = np.asarray(thumb, dtype=np.float64)
+    low = _DCT_LOW @ pixels @ _DCT_LOW.T
+    bits = np.packbits(low > np.median(low))
+    return int.from_bytes(bits.tobytes(), "big")
+
+
+def compute_phash(img_path: str) -> int:
+    """
+    Compute the perceptual hash of an image file cheaply.
+
+    For JPEGs, Image.draft() lets libjpeg scale the image down in the DCT
+    domain while decoding, so large photos are never decoded at full
+    resolution just to be shrunk to 32x32. Other formats decode normally.
+
+    Args:
+        img_path: Path to the image file
+
+    Returns:
+        Packed 64-bit phash (see phash64)
+    """
+    with Image.open(img_path, formats=IMAGE_FORMATS) as raw:
+        raw.draft("RGB", PHASH_DECODE_SIZE)
+        return phash64(raw)
+
+
+@dataclass
+class ImageRecord:
+    """
+    An image decoded once and handed between pipeline stages.
+
+    Carries everything the curator and annotator need (upload copy,
+    original size and phash) so later stages never re-open the file.
+    """
+    path: str
+    pil: Optional[Image.Image]  # RGB copy downscaled to MAX_API_EDGE; None once closed
+    width: int                  # original width
+    height: int                 # original height
+    phash: int                  # packed 64-bit phash (see phash64)
+
+    @classmethod
+    def load(cls, img_path: str, max_edge: int = MAX_API_EDGE) -> Optional["ImageRecord"]:
+        """
+        Decode an image file into a record.
+
+        The file is opened once: the original size is read from the header,
+        JPEGs are draft-decoded no smaller than max_edge, and the phash is
+        computed from the same downscaled copy that is sent to the model.
+
+        Args:
+            img_path: Path to the image file
+            max_edge: Maximum width/height of the upload copy
+
+        Returns:
+            ImageRecord, or None if the file is not a readable image
+        """
+        raw = safe_open(img_path)
+        if raw is None:
+            return None
+
+        with raw:
+            width, height = raw.size
+            raw.draft("RGB", (max_edge, max_edge))
+            image = raw.convert("RGB")
+
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        return cls(img_path, image, width, height, phash64(image))
+
+    @property
+    def phash_hex(self) -> str:
+        """Hash as 16 hex digits (the str() form of an imagehash.ImageHash)."""
+        return f"{self.phash:016x}"
+
+    def close(self):
+        """Release the decoded image; metadata stays available."""
+        if self.pil is not None:
+            self.pil.close()
+            self.pil = None
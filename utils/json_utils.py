@@ -0,0 +1,180 @@
+"""
+Fast JSON helpers for parsing model responses.
+"""
+import re
+import json
+from typing import Annotated, Any, List, Optional, TypedDict, Union
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used otherwise
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional; decode_boxes then defers to the generic parsers
+    msgspec = None
+
+# Raised by loads(); orjson.JSONDecodeError subclasses json.JSONDecodeError
+JSONDecodeError = json.JSONDecodeError
+
+_MD_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$', re.MULTILINE)
+_CODE_BLOCK = re.compile(r'```(?:json)?\s*([\s\S]*?)```')
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+_SINGLE_QUOTE = re.compile(r"(?<!\\)'")
+
+if msgspec is not None:
+    _Coord = Union[Annotated[int, msgspec.Meta(ge=0, le=1000)], Annotated[float, msgspec.Meta(ge=0, le=1000)]]
+
+    class _Box(TypedDict):
+        label: str
+        bbox: Annotated[List[_Coord], msgspec.Meta(min_length=4, max_length=4)]
+
+    # Decoder specialized to the annotation schema: shape and 0-1000 range
+    # are checked while parsing, with no separate validation pass
+    _BOX_DECODER = msgspec.json.Decoder(List[_Box])
+
+
+def loads(text: str) -> Any:
+    """
+    Parse a JSON document, using orjson when it is installed.
+
+    Args:
+        text: JSON text
+
+    Returns:
+        Parsed Python object
+
+    Raises:
+        json.JSONDecodeError: If the text is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Serialize to compact JSON text, using orjson when it is installed.
+
+    Args:
+        obj: JSON-serializable object
+
+    Returns:
+        JSON string without whitespace between items
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove leading/trailing ``` or ```json fences from a response."""
+    if '```' not in text:
+        return text.strip()
+    return _MD_FENCE.sub('', text).strip()
+
+
+def extract_code_block(text: str) -> Optional[str]:
+    """Return the contents of the first fenced code block, or None."""
+    match = _CODE_BLOCK.search(text)
+    return match.group(1).strip() if match else None
+
+
+def remove_trailing_commas(text: str) -> str:
+    """Drop trailing commas before closing braces/brackets (one regex pass)."""
+    return _TRAILING_COMMA.sub(r'\1', text)
+
+
+def normalize_quotes(text: str) -> str:
+    """Turn unescaped single quotes into double quotes (no-op if there are none)."""
+    if "'" not in text:
+        return text
+    return _SINGLE_QUOTE.sub('"', text)
+
+
+def decode_boxes(text: str) -> Optional[List[dict]]:
+    """
+    Parse and validate a box list in one step, if it is already well formed.
+
+    Accepts exactly [{"label": str, "bbox": [4 numbers in 0-1000]}, ...]
+    (other keys are dropped). Needs msgspec; without it, or for any
+    response that does not fit, returns None so callers fall back to
+    their lenient parsing and per-box checks.
+
+    Args:
+        text: Raw response text
+
+    Returns:
+        List of {"label", "bbox"} dicts, or None
+    """
+    if msgspec is None:
+        return None
+    try:
+        return _BOX_DECODER.decode(text)
+    except msgspec.DecodeError:  # includes ValidationError
+        return None
+
+
+def parse_llm_json(text: str) -> Any:
+    """
+    Parse a model response that should be JSON, doing only the cleanup it needs.
+
+    Responses that already start with '[' or '{' go straight to the parser;
+    code fences are stripped only otherwise, and the quote/trailing-comma
+    repairs run only after a failed parse.
+
+    Args:
+        text: Raw response text
+
+    Returns:
+        Parsed Python object
+
+    Raises:
+        json.JSONDecodeError: If the text is not valid JSON even after repair
+    """
+    text = text.strip()
+    if text[:1] not in ('[', '{'):
+        text = strip_code_fences(text)
+    try:
+        return loads(text)
+    except JSONDecodeError:
+        fixed = remove_trailing_commas(normalize_quotes(text))
+        if fixed == text:
+            raise
+        return loads(fixed)
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced {...} object in text, or None.
+
+    Scans forward tracking brace depth and skipping braces inside JSON
+    strings, so prose around the object is ignored without regex
+    backtracking. If an object is never closed (truncated response), the
+    scan restarts at the next opening brace.
+    """
+    start = text.find('{')
+    while start != -1:
+        depth = 0
+        in_string = escaped = False
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    return text[start:i + 1]
+        # Unbalanced from here to the end; retry from the next opening brace
+        start = text.find('{', start + 1)
+    return None
@@ -0,0 +1,52 @@
+"""
+Response cache for text-only LLM calls.
+"""
+import hashlib
+import functools
+from utils.config_loader import get_config
+from utils.disk_cache import get_cache, DEFAULT_TTL
+from utils.logger import get_logger
+
+logger = get_logger("llm_cache")
+
+# on: read + write, read_only: never store, write_only: refresh entries, off: bypass
+CACHE_MODES = ("on", "read_only", "write_only", "off")
+
+
+def cached_llm(namespace: str):
+    """
+    Decorator caching a method's text response per prompt.
+
+    The wrapped method must take the prompt as its first argument and
+    return the response text. Responses are stored in the "llm_<namespace>"
+    disk cache, keyed on the SHA-256 of the prompt, so identical requests
+    skip the model round-trip across runs. Empty responses (failed calls)
+    are never stored.
+
+    Behaviour follows cache.llm_mode in config (one of CACHE_MODES); the
+    whole cache is bypassed when caching is disabled (--no-cache).
+
+    Args:
+        namespace: Cache name for this call site (e.g. "main_parse")
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, prompt: str, *args, **kwargs):
+            mode = get_config().get('cache.llm_mode', 'on')
+            cache = get_cache(f"llm_{namespace}") if mode != "off" else None
+            if cache is None:
+                return func(self, prompt, *args, **kwargs)
+
+            key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+            if mode in ("on", "read_only"):
+                cached = cache.get(key)
+                if cached is not None:
+                    logger.debug(f"LLM cache hit ({namespace})")
+                    return cached
+
+            response = func(self, prompt, *args, **kwargs)
+            if response and mode in ("on", "write_only"):
+                cache.set(key, response, expire=DEFAULT_TTL)
+            return response
+        return wrapper
+    return decorator
@@ -1,18 +1,30 @@
 """
 Structured logging configuration for Foundry.
 """
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 from pathlib import Path
 
+# Background listener that writes queued records to the real handlers
+_listener = None
+
 def setup_logging(log_level=logging.INFO, log_file=None):
     """
     Set up structured logging for the Foundry application.
     
+    Records are put on an in-memory queue and written to the console/file
+    by a background QueueListener, so worker threads never block on
+    terminal or disk I/O while logging.
+    
     Args:
         log_level: Logging level (default: INFO)
         log_file: Optional path to log file. If None, logs only to console.
     """
+    global _listener
+    
     # Create formatter
     formatter = logging.Formatter(
         fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -23,14 +35,19 @@ def setup_logging(log_level=logging.INFO, log_file=None):
     root_logger = logging.getLogger("foundry")
     root_logger.setLevel(log_level)
     
-    # Remove existing handlers to avoid duplicates
+    # Flush and stop a previous listener, then remove existing handlers to avoid duplicates
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
     root_logger.handlers = []
     
+    handlers = []
+    
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # File handler (if specified)
     if log_file:
@@ -40,10 +57,24 @@ def setup_logging(log_level=logging.INFO, log_file=None):
         file_handler = logging.FileHandler(log_file)
         file_handler.setLevel(log_level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+    
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
     
     return root_logger
 
+def shutdown_logging():
+    """Stop the background listener, writing out any queued records."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown_logging)
+
 def get_logger(name):
     """
     Get a logger instance for a specific module.
@@ -55,4 +86,3 @@ def get_logger(name):
         Logger instance
     """
     return logging.getLogger(f"foundry.{name}")
-
@@ -9,6 +9,29 @@ from utils.logger import get_logger
 
 logger = get_logger("metrics")
 
+
+class Stopwatch:
+    """
+    Context manager timing a block with the monotonic perf_counter_ns clock.
+
+    Usage:
+        with Stopwatch() as sw:
+            do_work()
+        metrics.record_x(..., time_taken=sw.elapsed)
+    """
+
+    def __init__(self):
+        self._start_ns = 0
+        self.elapsed = 0.0  # seconds, set on exit
+
+    def __enter__(self) -> "Stopwatch":
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = (time.perf_counter_ns() - self._start_ns) / 1e9
+        return False
+
 class MetricsCollector:
     """
     Collects and tracks metrics throughout the pipeline execution.
@@ -35,7 +58,7 @@ class MetricsCollector:
         self.metrics["pipeline_runs"] += 1
         self.metrics["start_time"] = datetime.now()
         self.current_run = {
-            "start_time": time.time(),
+            "start_time": time.perf_counter(),
             "stages": {}
         }
         logger.info("📊 Started metrics collection for pipeline run")
@@ -44,20 +67,20 @@ class MetricsCollector:
         """End tracking current pipeline run."""
         self.metrics["end_time"] = datetime.now()
         if self.current_run:
-            total_time = time.time() - self.current_run["start_time"]
+            total_time = time.perf_counter() - self.current_run["start_time"]
             self.metrics["timings"]["pipeline_total"].append(total_time)
             logger.info(f"📊 Pipeline completed in {total_time:.2f}s")
             
     def start_stage(self, stage_name: str):
         """Start tracking a pipeline stage."""
         self.current_run["stages"][stage_name] = {
-            "start_time": time.time()
+            "start_time": time.perf_counter()
         }
         
     def end_stage(self, stage_name: str, success: bool = True, count: int = 0):
         """End tracking a pipeline stage."""
         if stage_name in self.current_run["stages"]:
-            elapsed = time.time() - self.current_run["stages"][stage_name]["start_time"]
+            elapsed = time.perf_counter() - self.current_run["stages"][stage_name]["start_time"]
             self.metrics["timings"][stage_name].append(elapsed)
             self.current_run["stages"][stage_name]["elapsed"] = elapsed
             self.current_run["stages"][stage_name]["success"] = success
@@ -0,0 +1,143 @@
+"""
+Persistent record of what the miner has already downloaded, backed by SQLite.
+"""
+import os
+import time
+import sqlite3
+import threading
+from typing import Iterable, List, Optional
+from utils.config_loader import get_config
+from utils.logger import get_logger
+
+logger = get_logger("mining_index")
+
+# SQLite integers are signed 64-bit; phashes use the full unsigned range
+_SIGN_BIT = 1 << 63
+_WRAP = 1 << 64
+
+
+def _to_db(image_hash: int) -> int:
+    return image_hash - _WRAP if image_hash >= _SIGN_BIT else image_hash
+
+
+def _from_db(value: int) -> int:
+    return value + _WRAP if value < 0 else value
+
+
+class MiningIndex:
+    """
+    Phashes of kept images and URLs already downloaded, per query, plus
+    the phash of every downloaded file.
+
+    Lets a new process pick up where earlier runs left off: known
+    near-duplicates are rejected without being kept twice, and search
+    results that were downloaded before are skipped without an HTTP
+    round-trip. Downloads are named after their content, so a file seen
+    again is matched by name and not hashed a second time. A single connection is shared behind a lock, so the index
+    is safe to use from worker threads.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open (or create) an index file.
+
+        Args:
+            path: Path to the SQLite database file
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS phashes ("
+            "hash INTEGER PRIMARY KEY, query TEXT NOT NULL, added_at INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "url TEXT PRIMARY KEY, query TEXT NOT NULL, added_at INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_phashes ("
+            "name TEXT PRIMARY KEY, hash INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def hashes(self, query: str) -> List[int]:
+        """Return the phashes of images kept for a query."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash FROM phashes WHERE query = ?", (query,)
+            ).fetchall()
+        return [_from_db(value) for (value,) in rows]
+
+    def add_hash(self, query: str, image_hash: int):
+        """Record the phash of a kept image."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO phashes (hash, query, added_at) VALUES (?, ?, ?)",
+                (_to_db(image_hash), query, int(time.time()))
+            )
+            self._conn.commit()
+
+    def file_hash(self, name: str) -> Optional[int]:
+        """Return the phash stored for a downloaded file name, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM file_phashes WHERE name = ?", (name,)
+            ).fetchone()
+        return _from_db(row[0]) if row else None
+
+    def add_file_hash(self, name: str, image_hash: int):
+        """Store the phash computed for a downloaded file name."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_phashes (name, hash) VALUES (?, ?)",
+                (name, _to_db(image_hash))
+            )
+            self._conn.commit()
+
+    def unseen_urls(self, urls: Iterable[str]) -> List[str]:
+        """Return the urls (in order) that have not been downloaded before."""
+        urls = list(urls)
+        if not urls:
+            return []
+        placeholders = ",".join("?" * len(urls))
+        with self._lock:
+            seen = {url for (url,) in self._conn.execute(
+                f"SELECT url FROM urls WHERE url IN ({placeholders})", urls
+            )}
+        return [url for url in urls if url not in seen]
+
+    def add_url(self, query: str, url: str):
+        """Record a downloaded url."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO urls (url, query, added_at) VALUES (?, ?, ?)",
+                (url, query, int(time.time()))
+            )
+            self._conn.commit()
+
+
+_index: Optional[MiningIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_mining_index() -> Optional[MiningIndex]:
+    """
+    Get the shared mining index.
+
+    Returns:
+        MiningIndex stored next to the result caches, or None if caching is
+        disabled in config (cache.enabled: false or the --no-cache CLI flag).
+    """
+    global _index
+    config = get_config()
+    if not config.get('cache.enabled', True):
+        return None
+
+    with _index_lock:
+        if _index is None:
+            cache_dir = config.get('cache.dir', 'data/.cache')
+            _index = MiningIndex(os.path.join(cache_dir, "miner.db"))
+            logger.debug(f"Opened mining index in {cache_dir}")
+        return _index
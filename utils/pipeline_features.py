@@ -7,7 +7,6 @@ This module provides:
 - Error Handling: Structured error management
 """
 from utils.metrics import get_metrics_collector
-from services.quality_loop import AnnotationRefinementLoop
 from utils.error_handler import ErrorHandler, create_error_response, create_success_response
 from utils.logger import get_logger
 
@@ -24,7 +23,7 @@ class PipelineFeatures:
         enable_metrics: bool = True,
         enable_quality_loop: bool = False,  # Optional, adds processing time
         quality_loop_iterations: int = 2,
-        validation_method: str = "coordinate"  # coordinate, visual, or hybrid
+        validation_method: str = "coordinate"  # coordinate, visual, hybrid or hybrid_fast
     ):
         """
         Initialize pipeline features.
@@ -33,7 +32,7 @@ class PipelineFeatures:
             enable_metrics: Enable metrics collection
             enable_quality_loop: Enable quality refinement loop
             quality_loop_iterations: Max iterations for quality loop
-            validation_method: Validation method - "coordinate", "visual", or "hybrid"
+            validation_method: Validation method - "coordinate", "visual", "hybrid" or "hybrid_fast"
         """
         self.enable_metrics = enable_metrics
         self.enable_quality_loop = enable_quality_loop
@@ -54,6 +53,9 @@ class PipelineFeatures:
     def create_quality_loop(self, annotator_agent):
         """Create quality refinement loop instance."""
         if self.enable_quality_loop and not self.quality_loop:
+            # Imported on use: only runs with the quality loop enabled need
+            # the validator (and its PIL/numpy imports)
+            from services.quality_loop import AnnotationRefinementLoop
             self.quality_loop = AnnotationRefinementLoop(
                 annotator_agent=annotator_agent,
                 max_iterations=self.quality_loop_iterations,
@@ -89,7 +91,7 @@ def initialize_pipeline_features(
         enable_metrics: Enable metrics collection
         enable_quality_loop: Enable quality refinement loop
         quality_loop_iterations: Max iterations for quality loop
-        validation_method: Validation method - "coordinate", "visual", or "hybrid"
+        validation_method: Validation method - "coordinate", "visual", "hybrid" or "hybrid_fast"
         
     Returns:
         PipelineFeatures instance